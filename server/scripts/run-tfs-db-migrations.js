@@ -0,0 +1,62 @@
+import mysql from 'mysql2/promise';
+import dotenv from 'dotenv';
+import fs from 'fs';
+import path from 'path';
+import { fileURLToPath } from 'url';
+
+const __filename = fileURLToPath(import.meta.url);
+const __dirname = path.dirname(__filename);
+
+dotenv.config();
+
+// Migrations for the inventory database (shopify_products, wheels, tires).
+// run-migrations.js applies migrations/ to DB_NAME (tfs-manager); these target tfs-db instead.
+const INVENTORY_DB = 'tfs-db';
+
+async function runTfsDbMigrations() {
+  let connection;
+
+  try {
+    console.log('🔌 Connecting to database...');
+
+    connection = await mysql.createConnection({
+      host: process.env.DB_HOST,
+      user: process.env.DB_USER,
+      password: process.env.DB_PASSWORD,
+      database: INVENTORY_DB,
+      port: process.env.DB_PORT || 3306,
+      multipleStatements: true
+    });
+
+    console.log('✅ Connected to database');
+    console.log(`📊 Database: ${INVENTORY_DB} @ ${process.env.DB_HOST}\n`);
+
+    const migrationsDir = path.join(__dirname, 'tfs-db-migrations');
+    const migrationFiles = fs.readdirSync(migrationsDir)
+      .filter(file => file.endsWith('.sql'))
+      .sort(); // Run in alphabetical order
+
+    console.log('🔄 Running tfs-db migrations...\n');
+
+    for (const file of migrationFiles) {
+      console.log(`  Running ${file}...`);
+      const sql = fs.readFileSync(path.join(migrationsDir, file), 'utf8');
+      await connection.query(sql);
+      console.log(`  ✅ ${file} completed`);
+    }
+
+    console.log('\n✅ All tfs-db migrations completed successfully!\n');
+
+  } catch (error) {
+    console.error('❌ Migration failed:', error.message);
+    console.error(error);
+    process.exit(1);
+  } finally {
+    if (connection) {
+      await connection.end();
+      console.log('\n🔌 Database connection closed');
+    }
+  }
+}
+
+runTfsDbMigrations();
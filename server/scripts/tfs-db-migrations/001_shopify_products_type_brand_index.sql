@@ -0,0 +1,27 @@
+-- tfs-db Migration 001: Index shopify_products on (product_type, brand)
+-- Applied to the inventory database (tfs-db) by run-tfs-db-migrations.js (npm run migrate:tfs-db).
+-- Reason: the scraper DatabaseClient filters by product_type and brand on every run
+--   * get_shopify_brands: SELECT brand ... WHERE product_type = ? GROUP BY brand
+--     becomes a loose index scan (one seek per distinct brand, no temp table or filesort)
+--   * restore_ended_sale_prices / prefetch_url_parts: brand IN (...) AND product_type = ?
+--     become index range scans
+-- MySQL has no CREATE INDEX IF NOT EXISTS, so the DDL is chosen at runtime to keep this re-runnable.
+
+SET @idx_exists = (
+    SELECT COUNT(*)
+    FROM information_schema.STATISTICS
+    WHERE TABLE_SCHEMA = DATABASE()
+      AND TABLE_NAME = 'shopify_products'
+      AND INDEX_NAME = 'idx_shopify_products_type_brand'
+);
+
+SET @ddl = IF(@idx_exists = 0,
+    'CREATE INDEX idx_shopify_products_type_brand ON shopify_products (product_type, brand)',
+    'SELECT 1');
+
+PREPARE create_idx FROM @ddl;
+EXECUTE create_idx;
+DEALLOCATE PREPARE create_idx;
+
+-- Verify completion
+SELECT 'shopify_products (product_type, brand) index present' AS Status;
@@ -0,0 +1,65 @@
+-- tfs-db Migration 002: Server-side restore of prices for ended sales
+-- Applied to the inventory database (tfs-db) by run-tfs-db-migrations.js (npm run migrate:tfs-db).
+-- Reason: restore_ended_sale_prices in the scraper DatabaseClient otherwise stages brands and
+-- scraped parts with client-side INSERT batches before its UPDATE. With this procedure it sends
+-- both lists as JSON in a single CALL; JSON_TABLE (MySQL 8.0+) unpacks them server-side.
+--   * brands_json:  ["Brand A", "Brand B", ...]   brands to restore
+--   * scraped_json: ["url-part-1", ...]           url_part_numbers seen this run (excluded)
+-- Returns one row: restored = number of products whose map_price was restored.
+-- The procedure body contains ';' - send this file as one multi-statement query
+-- (as run-tfs-db-migrations.js does) rather than splitting it on ';'.
+
+DROP PROCEDURE IF EXISTS sp_restore_ended_sale_prices;
+
+CREATE PROCEDURE sp_restore_ended_sale_prices(IN ptype VARCHAR(64), IN brands_json JSON, IN scraped_json JSON)
+BEGIN
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+    BEGIN
+        ROLLBACK;
+        RESIGNAL;
+    END;
+
+    -- Same session-scoped staging tables as the client-side path. Dropped again before returning
+    -- (and by the caller if this fails), since pooled connections are not reset between callers
+    DROP TEMPORARY TABLE IF EXISTS temp_restore_brands;
+    CREATE TEMPORARY TABLE temp_restore_brands (
+        brand VARCHAR(255) PRIMARY KEY
+    );
+    DROP TEMPORARY TABLE IF EXISTS temp_scraped_exclude;
+    CREATE TEMPORARY TABLE temp_scraped_exclude (
+        url_part_number VARCHAR(255) PRIMARY KEY
+    );
+
+    START TRANSACTION;
+
+    INSERT IGNORE INTO temp_restore_brands (brand)
+    SELECT j.brand
+    FROM JSON_TABLE(brands_json, '$[*]' COLUMNS (brand VARCHAR(255) PATH '$')) j;
+
+    INSERT IGNORE INTO temp_scraped_exclude (url_part_number)
+    SELECT j.url_part_number
+    FROM JSON_TABLE(scraped_json, '$[*]' COLUMNS (url_part_number VARCHAR(255) PATH '$')) j;
+
+    UPDATE shopify_products p
+    INNER JOIN temp_restore_brands b ON p.brand = b.brand
+    LEFT JOIN temp_scraped_exclude e ON p.url_part_number = e.url_part_number
+    SET
+        p.map_price = p.compare_at_price,
+        p.compare_at_price = NULL,
+        p.last_modified = NOW(),
+        p.last_sdw_sync = NOW()
+    WHERE e.url_part_number IS NULL
+    AND p.product_type = ptype
+    AND p.compare_at_price IS NOT NULL
+    AND p.map_price IS NOT NULL
+    AND p.compare_at_price > p.map_price;
+
+    SELECT ROW_COUNT() AS restored;
+
+    COMMIT;
+
+    DROP TEMPORARY TABLE IF EXISTS temp_restore_brands, temp_scraped_exclude;
+END;
+
+-- Verify completion
+SELECT 'sp_restore_ended_sale_prices created' AS Status;
@@ -1,48 +1,247 @@
-import mysql.connector
-from mysql.connector import pooling
+import aiomysql
 from typing import Set, Optional, Dict, List, Tuple
 import asyncio
 import os
-from functools import partial
+import json
+from contextlib import asynccontextmanager, contextmanager
+from functools import lru_cache
 import logging
+import math
+import tempfile
 from dotenv import load_dotenv
 import pathlib
 from collections import defaultdict
+from itertools import combinations
 import time
 
-# Load environment variables from multiple possible locations
-# 1. Try project root (for Railway/production)
-project_root = pathlib.Path(__file__).parent.parent.parent
-project_env = project_root / ".env"
-if project_env.exists():
-    load_dotenv(project_env)
-else:
-    # 2. Try hardcoded path (for local development)
-    dotenv_path = "/Users/jeremiah/Desktop/TFS Wheels/Scripts/.env"
-    if os.path.exists(dotenv_path):
-        load_dotenv(dotenv_path)
-    # 3. Railway will provide env vars directly, so load_dotenv can fail gracefully
-
 logger = logging.getLogger(__name__)
 
+# Columns _optimized_batch_update may write, in SET order
+_BATCH_COLUMNS = ('quantity', 'map_price', 'sdw_cost')
+
+# Above this many url_parts, bulk_insert_to_sync_queue ingests them via LOAD DATA LOCAL INFILE
+# (only when DB_LOCAL_INFILE is set)
+_LOAD_DATA_THRESHOLD = 1000
+
+# restore_ended_sale_prices filters up to this many brands with IN() instead of a temp-table join
+_INLINE_BRANDS_MAX = 500
+
+# Session-scoped staging tables of restore_ended_sale_prices (client-side and procedure paths)
+_DROP_RESTORE_TEMP_TABLES = "DROP TEMPORARY TABLE IF EXISTS temp_scraped_exclude, temp_restore_brands"
+
+# Escapes for LOAD DATA's default FIELDS ESCAPED BY '\\'
+_TSV_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def _tsv_field(value) -> str:
+    """Format one value for a LOAD DATA tab-separated file (None -> \\N)."""
+    if value is None:
+        return '\\N'
+    return str(value).translate(_TSV_ESCAPES)
+
+
+@contextmanager
+def _load_data_file(rows):
+    """Write rows (tuples in column order) to a temporary LOAD DATA file and yield its path."""
+    with tempfile.NamedTemporaryFile('w', encoding='utf-8', suffix='.tsv') as f:
+        f.writelines('\t'.join(map(_tsv_field, row)) + '\n' for row in rows)
+        f.flush()
+        yield f.name
+
+
+@lru_cache(maxsize=1)
+def _load_env_once() -> None:
+    """Load environment variables from the first .env found (runs at most once per process).
+
+    Always probed, even when the shell already sets DB_HOST: scrapers importing this module also
+    read ZENROWS_API_KEY, SCRAPING_MODE, EXCLUDED_BRANDS, ... from the same file. override=False
+    keeps any variable the environment already provides (e.g. on Railway).
+    """
+    # 1. Try project root (for Railway/production)
+    project_env = pathlib.Path(__file__).parent.parent.parent / ".env"
+    if project_env.exists():
+        load_dotenv(project_env, override=False)
+    elif not os.environ.get('RAILWAY_ENVIRONMENT'):
+        # 2. Try hardcoded path (for local development only)
+        dotenv_path = "/Users/jeremiah/Desktop/TFS Wheels/Scripts/.env"
+        if os.path.exists(dotenv_path):
+            load_dotenv(dotenv_path, override=False)
+
+
+def _parse_price(value) -> Optional[float]:
+    """Parse a scraped price/cost string, returning None when missing, unparseable, non-finite or negative."""
+    if not value:
+        return None
+    try:
+        price = float(value)
+    except (ValueError, TypeError):
+        return None
+    # float() also accepts 'nan', 'inf' and negatives, none of which is a real price
+    return price if math.isfinite(price) and price >= 0 else None
+
+
+def _cents(price) -> Optional[int]:
+    """Convert a price (float or DB Decimal) to integer cents so equal prices compare equal."""
+    return int(round(float(price) * 100)) if price is not None else None
+
+
+def _parse_product(product: Dict) -> Tuple[Optional[str], int, Optional[float], Optional[float]]:
+    """Parse a scraped product once into (url_part, quantity, price, cost).
+
+    Unusable prices parse as None instead of raising, so one bad row can't abort a batch:
+
+    >>> _parse_product({'url_part_number': 'abc-1', 'quantity': '1,200', 'price_map': 'nan', 'cost': ''})
+    ('abc-1', 1200, None, None)
+    >>> _parse_product({'url_part_number': 'abc-2', 'quantity': '', 'price_map': 'inf', 'cost': '-5'})
+    ('abc-2', 0, None, None)
+    """
+    qty_str = product.get('quantity')
+    qty_str = qty_str.replace(',', '') if qty_str else '0'
+    quantity = int(qty_str) if qty_str.isdigit() else 0
+    return (product.get('url_part_number'), quantity,
+            _parse_price(product.get('price_map')), _parse_price(product.get('cost')))
+
+
+def _padded(values: List) -> List:
+    """Pad a non-empty IN() parameter list to the next power of two by repeating its last value.
+
+    Bucketing the length keeps the cached query builders below at O(log N) entries;
+    a repeated value in IN() doesn't change the result.
+    """
+    n = len(values)
+    size = 1 << (n - 1).bit_length()
+    return list(values) + [values[-1]] * (size - n)
+
+
+@lru_cache(maxsize=256)
+def _brands_query(table: str, columns: str, n: int) -> str:
+    return f"""
+        SELECT {columns}
+        FROM {table}
+        WHERE brand IN ({', '.join(['%s'] * n)})
+          AND url_part_number IS NOT NULL
+          AND product_type = %s
+    """
+
+
+@lru_cache(maxsize=256)
+def _zero_quantity_query(table: str, n: int) -> str:
+    return f"""
+        UPDATE {table}
+        SET quantity = 0,
+            last_modified = NOW(),
+            last_sdw_sync = NOW()
+        WHERE url_part_number IN ({', '.join(['%s'] * n)})
+        AND product_type = %s
+    """
+
+
+@lru_cache(maxsize=256)
+def _case_update_query(table: str, column: str, n: int) -> str:
+    return f"""
+        UPDATE {table}
+        SET {column} = CASE url_part_number {' '.join(['WHEN %s THEN %s'] * n)} END,
+            last_modified = NOW(),
+            last_sdw_sync = NOW()
+        WHERE url_part_number IN ({', '.join(['%s'] * n)})
+        AND product_type = %s
+    """
+
+
+@lru_cache(maxsize=64)
+def _restore_sale_prices_query(table: str, n: int, exclude_scraped: bool) -> str:
+    exclude_join = "LEFT JOIN temp_scraped_exclude e ON p.url_part_number = e.url_part_number" if exclude_scraped else ""
+    exclude_where = "AND e.url_part_number IS NULL" if exclude_scraped else ""
+    return f"""
+        UPDATE {table} p
+        {exclude_join}
+        SET
+            p.map_price = p.compare_at_price,
+            p.compare_at_price = NULL,
+            p.last_modified = NOW(),
+            p.last_sdw_sync = NOW()
+        WHERE p.brand IN ({', '.join(['%s'] * n)})
+        AND p.product_type = %s
+        {exclude_where}
+        AND p.compare_at_price IS NOT NULL
+        AND p.map_price IS NOT NULL
+        AND p.compare_at_price > p.map_price
+    """
+
+
+@lru_cache(maxsize=256)
+def _sync_queue_query(table: str, n: int) -> str:
+    return f"""
+        INSERT INTO shopify_sync_queue
+        (shopify_id, variant_id, part_number, change_type, new_quantity)
+        SELECT shopify_id, variant_id, part_number, 'quantity', %s
+        FROM {table}
+        WHERE url_part_number IN ({', '.join(['%s'] * n)})
+          AND shopify_id IS NOT NULL
+          AND variant_id IS NOT NULL
+          AND product_type = %s
+    """
+
+
+class DatabaseSession:
+    """One pooled connection and one open transaction shared by many single-row updates.
+
+    Obtained from DatabaseClient.session(); writes are committed by commit() or when the
+    session block exits cleanly, and rolled back if it raises. Without a cursor (no-db mode)
+    every method is a no-op.
+    """
+
+    def __init__(self, client: 'DatabaseClient', connection=None, cursor=None):
+        self._q = client._q
+        self._connection = connection
+        self._cursor = cursor
+
+    async def _execute(self, key: str, params: Tuple) -> int:
+        if self._cursor is None:
+            return 0
+        await self._cursor.execute(self._q[key], params)
+        return self._cursor.rowcount
+
+    async def update_quantity(self, url_part: str, quantity: int, product_type: str) -> int:
+        return await self._execute('update_quantity', (quantity, url_part, product_type))
+
+    async def update_cost(self, url_part: str, cost: float, product_type: str) -> int:
+        return await self._execute('update_cost', (cost, url_part, product_type))
+
+    async def update_map_price(self, url_part: str, price: float, product_type: str) -> int:
+        return await self._execute('update_map_price', (price, url_part, product_type))
+
+    async def commit(self) -> None:
+        """Commit everything written so far and keep the session open for more."""
+        if self._connection is not None:
+            await self._connection.commit()
+            await self._connection.begin()
+
+
 class DatabaseClient:
     def __init__(self, no_db: bool = False):
         self.no_db = no_db
         self.mode = None  # 'wheels' or 'tires'
+        self._table = None  # mode_to_table[mode], resolved in init()
         print("Initializing DatabaseClient..." + (" (no-db mode)" if no_db else ""))
         
-        # Optimized database configuration
+        _load_env_once()
+        
+        # Optimized database configuration (aiomysql pool - native asyncio I/O)
         self.db_config = {
             'host': os.environ.get('DB_HOST'),
             'user': os.environ.get('DB_USER'),
             'password': os.environ.get('DB_PASSWORD'),
-            'database': os.environ.get('DB_NAME'),
-            'pool_size': 20,  # Reduced pool size but optimized usage
-            'pool_reset_session': True,
-            'connection_timeout': 120,
+            'db': os.environ.get('DB_NAME'),
+            'minsize': 5,
+            'maxsize': 20,
+            'connect_timeout': 120,
+            # aiomysql does not reset session state on release (no COM_RESET_CONNECTION per acquire).
+            # Nothing here sets session variables, and every temporary table is dropped by the
+            # method that creates it.
             'autocommit': True,
-            'buffered': True,  # Add buffered cursors for better performance
-            'use_unicode': True,
+            # Opt-in LOAD DATA path in bulk_insert_to_sync_queue; the server must allow local_infile too
+            'local_infile': os.environ.get('DB_LOCAL_INFILE', '').lower() in ('1', 'true', 'yes'),
             'charset': 'utf8mb4'
         }
         
@@ -56,21 +255,26 @@ class DatabaseClient:
         
         # In-memory cache for URL parts - optimizes lookups
         self._url_parts_cache = {}  # brand -> set of url_parts (for backwards compatibility)
-        self._all_url_parts = set()  # all url_parts across all brands (brand-agnostic)
-        self._product_data_cache = {}  # url_part -> {quantity, price} for change detection
+        # Current DB quantity/price for change detection, as two flat dicts instead of a dict per row
+        self._qty_cache = {}  # url_part -> quantity
+        self._price_cache = {}  # url_part -> map_price in integer cents (None if unset)
+        self._cost_cache = {}  # url_part -> sdw_cost in integer cents (None if unset)
+        # All url_parts across all brands (brand-agnostic). A live view of _qty_cache's keys
+        # rather than a second set holding the same strings.
+        self._all_url_parts = self._qty_cache.keys()
         self._cache_loaded = False
         
         # Statistics tracking
         self._stats = defaultdict(int)
         self._stats_lock = asyncio.Lock()
-        
-        if not self.no_db:
-            try:
-                self.connection_pool = mysql.connector.pooling.MySQLConnectionPool(**self.db_config)
-                print("Connection pool created successfully")
-            except Exception as e:
-                print(f"Error creating connection pool: {e}")
-                raise
+
+        # False once sp_restore_ended_sale_prices (tfs-db migration 002) is known to be missing
+        self._restore_proc_available = None
+
+        # Server max_allowed_packet, read on first use by _packet_batch_size
+        self._max_packet = None
+
+        self._product_type_str = self._db_product_type()
 
     def _db_product_type(self) -> str:
         """Return the actual product_type value in the DB ('wheel' or 'tire') based on self.mode."""
@@ -78,31 +282,155 @@ class DatabaseClient:
 
     async def init(self, mode: str) -> None:
         self.mode = mode
+        # Resolved once here; query methods read these attributes instead of re-deriving them per call
+        self._product_type_str = self._db_product_type()
+        self._table = self.mode_to_table[mode]
         print(f"Initializing database for mode: {mode}" + (" (no-db mode)" if self.no_db else ""))
-        print("Database initialized successfully")
 
-    async def _get_connection(self):
-        if self.no_db:
-            print("No-db mode: Skipping database connection")
-            return None
-        
-        max_attempts = 3
-        for attempt in range(max_attempts):
+        # The pool is bound to the running event loop, so it is created here rather than in __init__
+        if not self.no_db and self.connection_pool is None:
             try:
-                loop = asyncio.get_event_loop()
-                connection = await loop.run_in_executor(None, self.connection_pool.get_connection)
-                connection.autocommit = True
-                return connection
-            except mysql.connector.errors.PoolError as e:
-                logger.warning(f"Connection pool error (attempt {attempt+1}/{max_attempts}): {e}")
-                if attempt < max_attempts - 1:
-                    await asyncio.sleep(0.5 * (attempt + 1))  # Shorter retry delay
-                else:
-                    raise
+                self.connection_pool = await aiomysql.create_pool(**self.db_config)
+                print("Connection pool created successfully")
             except Exception as e:
-                logger.error(f"Error getting connection from pool: {e}")
+                print(f"Error creating connection pool: {e}")
                 raise
 
+        # aiomysql speaks the text protocol only (no COM_STMT_PREPARE), so the closest
+        # equivalent to prepared statements is building each fixed query string once
+        self._q = self._build_queries()
+        print("Database initialized successfully")
+
+    def _build_queries(self) -> Dict:
+        """Build the fixed-shape SQL strings once for the current mode (see init)."""
+        table = self._table
+        queries = {
+            'url_parts_for_brand': f"""
+                SELECT url_part_number 
+                FROM {table} 
+                WHERE brand = %s 
+                  AND url_part_number IS NOT NULL 
+                  AND product_type = %s
+            """,
+            'verify': f"""
+                SELECT url_part_number, product_type, quantity, map_price, sdw_cost, last_modified
+                FROM {table}
+                WHERE url_part_number = %s
+                  AND product_type = %s
+            """,
+            'update_map_price': f"""
+                UPDATE {table}
+                SET map_price = %s, 
+                    last_modified = NOW(),
+                    last_sdw_sync = NOW()
+                WHERE url_part_number = %s
+                AND product_type = %s
+            """,
+            'update_cost': f"""
+                UPDATE {table}
+                SET sdw_cost = %s, 
+                    last_modified = NOW(),
+                    last_sdw_sync = NOW()
+                WHERE url_part_number = %s
+                AND product_type = %s
+            """,
+            'update_quantity': f"""
+                UPDATE {table}
+                SET quantity = %s, 
+                    last_modified = NOW(),
+                    last_sdw_sync = NOW()
+                WHERE url_part_number = %s
+                AND product_type = %s
+            """,
+            'zero_quantity_brand': f"""
+                UPDATE {table}
+                SET quantity = 0,
+                    last_modified = NOW(),
+                    last_sdw_sync = NOW()
+                WHERE product_type = %s
+                AND brand = %s
+            """,
+            # GROUP BY over the (product_type, brand) index (tfs-db migration 001) is a loose index scan:
+            # one seek per distinct brand, already in brand order
+            'shopify_brands': f"""
+                SELECT brand
+                FROM {table}
+                WHERE product_type = %s
+                  AND brand IS NOT NULL
+                  AND brand != ''
+                GROUP BY brand
+                ORDER BY brand
+            """,
+            'restore_sale_prices': f"""
+                UPDATE {table} p
+                INNER JOIN temp_restore_brands b ON p.brand = b.brand
+                SET
+                    p.map_price = p.compare_at_price,
+                    p.compare_at_price = NULL,
+                    p.last_modified = NOW(),
+                    p.last_sdw_sync = NOW()
+                WHERE p.product_type = %s
+                AND p.compare_at_price IS NOT NULL
+                AND p.map_price IS NOT NULL
+                AND p.compare_at_price > p.map_price
+            """,
+            'restore_sale_prices_excluding': f"""
+                UPDATE {table} p
+                INNER JOIN temp_restore_brands b ON p.brand = b.brand
+                LEFT JOIN temp_scraped_exclude e ON p.url_part_number = e.url_part_number
+                SET
+                    p.map_price = p.compare_at_price,
+                    p.compare_at_price = NULL,
+                    p.last_modified = NOW(),
+                    p.last_sdw_sync = NOW()
+                WHERE e.url_part_number IS NULL
+                AND p.product_type = %s
+                AND p.compare_at_price IS NOT NULL
+                AND p.map_price IS NOT NULL
+                AND p.compare_at_price > p.map_price
+            """,
+            'sync_queue_from_tmp': f"""
+                INSERT INTO shopify_sync_queue
+                (shopify_id, variant_id, part_number, change_type, new_quantity)
+                SELECT p.shopify_id, p.variant_id, p.part_number, 'quantity', %s
+                FROM {table} p
+                JOIN tmp_sync_urls u ON p.url_part_number = u.url_part_number
+                WHERE p.shopify_id IS NOT NULL
+                  AND p.variant_id IS NOT NULL
+                  AND p.product_type = %s
+            """,
+        }
+        # One temp-table JOIN UPDATE per non-empty subset of batch columns; a NULL in _upd
+        # means "unchanged" for that row, so COALESCE keeps the current value
+        for n in range(1, len(_BATCH_COLUMNS) + 1):
+            for columns in combinations(_BATCH_COLUMNS, n):
+                sets = ', '.join(f"t.{column} = COALESCE(u.{column}, t.{column})" for column in columns)
+                queries[('batch_update', columns)] = f"""
+                UPDATE {table} t
+                JOIN _upd u
+                  ON t.url_part_number = u.url_part_number
+                 AND t.product_type = %s
+                SET {sets},
+                    t.last_modified = NOW(),
+                    t.last_sdw_sync = NOW()
+            """
+        return queries
+
+    def _acquire(self):
+        """Acquire a pooled connection (async context manager; released back to the pool on exit)."""
+        return self.connection_pool.acquire()
+
+    async def _packet_batch_size(self, cursor, per_row_est: int = 260, overhead: int = 1024) -> int:
+        """Rows per multi-row statement that fit in the server's max_allowed_packet.
+
+        aiomysql interpolates parameters client-side, so the packet size (not a placeholder
+        count) is the only limit. per_row_est covers a quoted, escaped VARCHAR(255) plus separators.
+        """
+        if self._max_packet is None:
+            await cursor.execute("SELECT @@max_allowed_packet")
+            (self._max_packet,) = await cursor.fetchone()
+        return max(256, (self._max_packet - overhead) // per_row_est)
+
     async def prefetch_url_parts(self, brands: List[str]) -> None:
         """Prefetch and cache URL parts with current quantity and price for change detection."""
         if self.no_db:
@@ -112,44 +440,42 @@ class DatabaseClient:
         logger.info(f"Prefetching URL parts with quantity/price data for {len(brands)} brands...")
         start_time = time.time()
 
-        connection = None
         try:
-            connection = await self._get_connection()
-            cursor = connection.cursor(buffered=True)
-
             # Get all URL parts WITH current quantity and price for change detection
-            placeholders = ', '.join(['%s'] * len(brands))
-            query = f"""
-                SELECT brand, url_part_number, quantity, map_price
-                FROM {self.mode_to_table[self.mode]}
-                WHERE brand IN ({placeholders})
-                  AND url_part_number IS NOT NULL
-                  AND product_type = %s
-            """
+            padded_brands = _padded(brands)
+            query = _brands_query(self._table,
+                                  'brand, url_part_number, quantity, map_price, sdw_cost', len(padded_brands))
 
-            params = list(brands) + [self._db_product_type()]
-            cursor.execute(query, params)
+            params = padded_brands + [self._product_type_str]
 
-            # Build cache
-            self._url_parts_cache = {brand: set() for brand in brands}
-            self._all_url_parts = set()  # Brand-agnostic cache
-            self._product_data_cache = {}  # url_part -> {quantity, price}
+            url_parts_cache = defaultdict(set)
+            qty_cache = {}
+            price_cache = {}
+            cost_cache = {}
             row_count = 0
 
-            for row in cursor:
-                brand, url_part, quantity, price = row
-                if brand in self._url_parts_cache:
-                    self._url_parts_cache[brand].add(url_part)
-                self._all_url_parts.add(url_part)  # Add to brand-agnostic cache
-
-                # Cache current quantity and price for change detection
-                self._product_data_cache[url_part] = {
-                    'quantity': int(quantity) if quantity is not None else 0,
-                    'price': float(price) if price is not None else None
-                }
-                row_count += 1
-
-            cursor.close()
+            # Unbuffered (server-side) cursor: rows stream in 10k chunks, so building the cache
+            # overlaps with the network transfer and the full result never sits in memory at once
+            async with self._acquire() as connection:
+                async with connection.cursor(aiomysql.SSCursor) as cursor:
+                    await cursor.execute(query, params)
+                    while True:
+                        rows = await cursor.fetchmany(10000)
+                        if not rows:
+                            break
+                        for brand, url_part, quantity, price, cost in rows:
+                            url_parts_cache[brand].add(url_part)
+                            # Cache current quantity, price and cost for change detection
+                            qty_cache[url_part] = int(quantity or 0)
+                            price_cache[url_part] = _cents(price)
+                            cost_cache[url_part] = _cents(cost)
+                        row_count += len(rows)
+
+            self._url_parts_cache = {brand: url_parts_cache.get(brand, set()) for brand in brands}
+            self._qty_cache = qty_cache
+            self._price_cache = price_cache
+            self._cost_cache = cost_cache
+            self._all_url_parts = qty_cache.keys()  # Brand-agnostic cache
             self._cache_loaded = True
 
             elapsed = time.time() - start_time
@@ -168,10 +494,10 @@ class DatabaseClient:
             logger.error(f"Error prefetching URL parts: {e}")
             # Initialize empty cache as fallback
             self._url_parts_cache = {brand: set() for brand in brands}
-            self._all_url_parts = set()
-        finally:
-            if connection:
-                connection.close()
+            self._qty_cache = {}
+            self._price_cache = {}
+            self._cost_cache = {}
+            self._all_url_parts = self._qty_cache.keys()
 
     def get_cached_url_parts(self, brand: str) -> Set[str]:
         """Get URL parts for a brand from cache."""
@@ -185,46 +511,44 @@ class DatabaseClient:
         logger.debug(f"batch_update_products_streaming called with {len(products)} products")
 
         # Separate products into different update categories
-        matched_full_update = []      # Existing products needing full update
+        matched_full_update = []      # (url_part, quantity, price, cost) of existing products; None = unchanged
         unmatched_products = []       # New products to store
         skipped_unchanged = 0         # Track products skipped due to no changes
 
+        # Hoist cache lookups out of the per-product loop
+        qty_get = self._qty_cache.get
+        price_cache = self._price_cache
+        cost_cache = self._cost_cache
+
         for product in products:
-            url_part = product.get('url_part_number')
-            if url_part:
-                # Use brand-agnostic cache for matching (fixes brand name variations)
-                if url_part in self._all_url_parts:
-                    # Product exists in database - check if it actually changed
-                    cached_data = self._product_data_cache.get(url_part)
-
-                    # Parse scraped quantity and price
-                    qty_str = product.get('quantity', '').replace(',', '') if product.get('quantity') else '0'
-                    scraped_quantity = int(qty_str) if qty_str.isdigit() else 0
-
-                    price_str = product.get('price_map', '')
-                    scraped_price = float(price_str) if price_str and price_str.replace('.', '').isdigit() else None
-
-                    # Compare with cached data
-                    if cached_data:
-                        db_quantity = cached_data.get('quantity', 0)
-                        db_price = cached_data.get('price')
-
-                        # Check if anything actually changed
-                        quantity_changed = (scraped_quantity != db_quantity)
-                        price_changed = (scraped_price != db_price) if scraped_price is not None else False
-
-                        # Only update if something changed
-                        if quantity_changed or price_changed:
-                            matched_full_update.append(product)
-                        else:
-                            # No changes detected - skip this product
-                            skipped_unchanged += 1
-                    else:
-                        # No cached data - proceed with update (shouldn't happen but be safe)
-                        matched_full_update.append(product)
-                else:
+            # One bad row is skipped; it must not abort the rest of the batch
+            try:
+                url_part, scraped_quantity, scraped_price, scraped_cost = _parse_product(product)
+                if not url_part:
+                    continue
+
+                # Use brand-agnostic cache for matching (fixes brand name variations);
+                # one probe answers both "is it in the DB" and "what quantity does it have"
+                db_quantity = qty_get(url_part)
+                if db_quantity is None:
                     # New product
                     unmatched_products.append(product)
+                    continue
+
+                # Product exists in database - keep only the fields that changed (None = unchanged).
+                # Prices compare as integer cents; float equality would flag e.g. 19.95 vs 19.950000000000003
+                quantity = scraped_quantity if scraped_quantity != db_quantity else None
+                price = scraped_price if scraped_price is not None and _cents(scraped_price) != price_cache[url_part] else None
+                cost = scraped_cost if scraped_cost is not None and _cents(scraped_cost) != cost_cache[url_part] else None
+            except (ValueError, TypeError, AttributeError, OverflowError) as e:
+                logger.debug(f"Error parsing product data for {product.get('url_part_number')}: {e}")
+                continue
+
+            if quantity is None and price is None and cost is None:
+                # No changes detected - skip this product
+                skipped_unchanged += 1
+            else:
+                matched_full_update.append((url_part, quantity, price, cost))
 
         # DIAGNOSTIC: Log matching statistics
         logger.debug(f"Batch categorization: {len(matched_full_update)} matched (update), "
@@ -243,85 +567,61 @@ class DatabaseClient:
             logger.debug("No products to process")
             return 0, 0
 
-        total_updates = 0
-        total_stored = 0
+        async def _update_matched() -> int:
+            # Values were parsed once during classification
+            url_parts, quantities, prices, costs = map(list, zip(*matched_full_update))
 
-        # Process matched products
-        if matched_full_update:
-            # Prepare data for batch update
-            url_parts = []
-            quantities = []
-            prices = []
-            costs = []
+            matched_updates = await self._optimized_batch_update(url_parts, quantities, prices, costs)
+            logger.info(f"💾 Batch: {len(products)} products -> {matched_updates} updated, {skipped_unchanged} skipped")
 
-            for product in matched_full_update:
-                url_part = product.get('url_part_number')
-                if not url_part:
-                    continue
-                    
-                try:
-                    # Parse quantity
-                    qty_str = product.get('quantity', '').replace(',', '') if product.get('quantity') else '0'
-                    quantity = int(qty_str) if qty_str.isdigit() else 0
-                    
-                    # Parse price
-                    price_str = product.get('price_map', '')
-                    price = float(price_str) if price_str and price_str.replace('.', '').isdigit() else None
-                    
-                    # Parse cost
-                    cost_str = product.get('cost', '')
-                    cost = float(cost_str) if cost_str and cost_str.replace('.', '').isdigit() else None
-                    
-                    url_parts.append(url_part)
-                    quantities.append(quantity)
-                    prices.append(price)
-                    costs.append(cost)
-                    
-                except (ValueError, TypeError) as e:
-                    logger.debug(f"Error parsing product data for {url_part}: {e}")
-                    continue
-            
-            if url_parts:
-                matched_updates = await self._optimized_batch_update(url_parts, quantities, prices, costs)
-                total_updates += matched_updates
-                logger.info(f"💾 Batch: {len(products)} products -> {matched_updates} updated, {skipped_unchanged} skipped")
-
-                # Update cache with new values to keep it in sync
-                for idx, url_part in enumerate(url_parts):
-                    if url_part in self._product_data_cache:
-                        self._product_data_cache[url_part]['quantity'] = quantities[idx]
-                        if prices[idx] is not None:
-                            self._product_data_cache[url_part]['price'] = prices[idx]
-
-        # Process unmatched products (new products to store)
-        if unmatched_products:
+            # Update cache with new values to keep it in sync
+            self._sync_cache(matched_full_update)
+            return matched_updates
+
+        async def _store_unmatched() -> int:
             stored_count = await self._store_new_products(unmatched_products)
-            total_stored += stored_count
             logger.debug(f"Stored {stored_count} new products in not_scraped table")
+            return stored_count
+
+        # Matched products update shopify_products and new products go to not_scraped;
+        # the tables are disjoint, so both round-trips run concurrently
+        total_updates, total_stored = await asyncio.gather(
+            _update_matched() if matched_full_update else asyncio.sleep(0, result=0),
+            _store_unmatched() if unmatched_products else asyncio.sleep(0, result=0),
+        )
 
         return total_updates, total_stored
 
+    def _sync_cache(self, rows: List[Tuple[str, Optional[int], Optional[float], Optional[float]]]) -> None:
+        """Write (url_part, quantity, price, cost) rows back into the change-detection caches.
+
+        None fields were not written and stay as cached.
+        """
+        qty_cache = self._qty_cache
+        price_cache = self._price_cache
+        cost_cache = self._cost_cache
+        for url_part, quantity, price, cost in rows:
+            if url_part in qty_cache:
+                if quantity is not None:
+                    qty_cache[url_part] = quantity
+                if price is not None:
+                    price_cache[url_part] = _cents(price)
+                if cost is not None:
+                    cost_cache[url_part] = _cents(cost)
+
     async def _store_new_products(self, products: List[Dict]) -> int:
         """Store new products (not in main database) to not_scraped table."""
         if self.no_db or not products:
             return 0
         
         # Filter products with valid data (non-zero quantity and has pricing)
+        product_type = self._product_type_str
         valid_products = []
         for product in products:
             try:
-                # Parse quantity - only store if quantity > 0 (not backordered)
-                qty_str = product.get('quantity', '').replace(',', '') if product.get('quantity') else '0'
-                quantity = int(qty_str) if qty_str.isdigit() else 0
-                
-                # Parse prices
-                price_str = product.get('price_map', '')
-                price = float(price_str) if price_str and price_str.replace('.', '').isdigit() else None
+                _, quantity, price, cost = _parse_product(product)
                 
-                cost_str = product.get('cost', '')
-                cost = float(cost_str) if cost_str and cost_str.replace('.', '').isdigit() else None
-                
-                # Only store if quantity > 0 and has at least one price
+                # Only store if quantity > 0 (not backordered) and has at least one price
                 if quantity > 0 and (price is not None or cost is not None):
                     valid_products.append({
                         'brand': product.get('brand', ''),
@@ -331,10 +631,10 @@ class DatabaseClient:
                         'map_price': price,
                         'sdw_cost': cost,
                         'url': product.get('url', ''),
-                        'product_type': self._db_product_type()  # ADD THIS LINE
+                        'product_type': product_type
                     })
                     
-            except (ValueError, TypeError) as e:
+            except (ValueError, TypeError, AttributeError) as e:
                 logger.debug(f"Error parsing new product data: {e}")
                 continue
         
@@ -342,158 +642,130 @@ class DatabaseClient:
             logger.debug("No valid new products to store")
             return 0
         
-        # Batch insert/update to not_scraped table
-        batch_size = 100
+        # Batch insert/update to not_scraped table.
+        # executemany rewrites the single-row INSERT into one multi-row statement per batch,
+        # so the SQL text is fixed; 8 params per row keeps 5000 rows under the 65535 placeholder cap.
+        batch_size = 5000
         total_stored = 0
+        query = """
+            INSERT INTO not_scraped 
+            (brand, part_number, url_part_number, quantity, map_price, sdw_cost, url, product_type)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                quantity = VALUES(quantity),
+                map_price = VALUES(map_price),
+                sdw_cost = VALUES(sdw_cost),
+                url = VALUES(url),
+                product_type = VALUES(product_type)
+        """
         
-        for i in range(0, len(valid_products), batch_size):
-            batch = valid_products[i:i+batch_size]
-            
-            connection = None
-            try:
-                connection = await self._get_connection()
-                cursor = connection.cursor(buffered=True)
-                
-                # UPDATE THE QUERY TO INCLUDE product_type
-                placeholders = "(%s, %s, %s, %s, %s, %s, %s, %s)"  # Added one more %s
-                values_clause = ", ".join([placeholders] * len(batch))
-                
-                query = f"""
-                    INSERT INTO not_scraped 
-                    (brand, part_number, url_part_number, quantity, map_price, sdw_cost, url, product_type)
-                    VALUES {values_clause}
-                    ON DUPLICATE KEY UPDATE
-                        quantity = VALUES(quantity),
-                        map_price = VALUES(map_price),
-                        sdw_cost = VALUES(sdw_cost),
-                        url = VALUES(url),
-                        product_type = VALUES(product_type)
-                """
-                
-                # Flatten product data for query
-                params = []
-                for product in batch:
-                    params.extend([
-                        product['brand'],
-                        product['part_number'],
-                        product['url_part_number'],
-                        product['quantity'],
-                        product['map_price'],
-                        product['sdw_cost'],
-                        product['url'],
-                        product['product_type']  # ADD THIS LINE
-                    ])
-                
-                cursor.execute(query, params)
-                affected = cursor.rowcount
-                total_stored += affected
-                connection.commit()
-                cursor.close()
-                
-                logger.debug(f"Stored/updated {affected} new products (batch {i//batch_size + 1})")
-                
-            except Exception as e:
-                logger.error(f"Error storing new products batch: {e}")
-            finally:
-                if connection:
-                    connection.close()
+        try:
+            # One connection for every batch of this call
+            async with self._acquire() as connection:
+                async with connection.cursor() as cursor:
+                    for i in range(0, len(valid_products), batch_size):
+                        batch = valid_products[i:i+batch_size]
+                        
+                        try:
+                            rows = [
+                                (p['brand'], p['part_number'], p['url_part_number'], p['quantity'],
+                                 p['map_price'], p['sdw_cost'], p['url'], p['product_type'])
+                                for p in batch
+                            ]
+                            
+                            await cursor.executemany(query, rows)
+                            affected = cursor.rowcount
+                            total_stored += affected
+                            
+                            logger.debug(f"Stored/updated {affected} new products (batch {i//batch_size + 1})")
+                            
+                        except Exception as e:
+                            logger.error(f"Error storing new products batch: {e}")
+        except Exception as e:
+            logger.error(f"Error acquiring connection to store new products: {e}")
         
         return total_stored
 
-    async def _optimized_batch_update(self, url_parts: List[str], quantities: List[int], 
-                                    prices: List[Optional[float]], costs: List[Optional[float]]) -> int:
-        """Highly optimized batch update with single transaction."""
+    async def _optimized_batch_update(self, url_parts: List[str], quantities: List[Optional[int]], 
+                                    prices: List[Optional[float]], costs: List[Optional[float]],
+                                    product_type: Optional[str] = None) -> int:
+        """Highly optimized batch update with single transaction.
+
+        A None quantity/price/cost leaves that column unchanged; columns that are None for the
+        whole batch are left out of the UPDATE entirely.
+        """
         if not url_parts:
             return 0
         
-        product_type = self._db_product_type()
+        product_type = product_type or self._product_type_str
         batch_size = 300  # Optimized batch size
-        total_updates = 0
         
-        for i in range(0, len(url_parts), batch_size):
+        async def _run_batch(cursor, i: int) -> int:
             batch_urls = url_parts[i:i+batch_size]
             batch_quantities = quantities[i:i+batch_size]
             batch_prices = prices[i:i+batch_size]
             batch_costs = costs[i:i+batch_size]
             
-            connection = None
+            # SET only the columns that changed somewhere in this batch
+            columns = tuple(column for column, values in zip(_BATCH_COLUMNS, (batch_quantities, batch_prices, batch_costs))
+                            if any(value is not None for value in values))
+            if not columns:
+                return 0
+            
             try:
-                connection = await self._get_connection()
-                cursor = connection.cursor(buffered=True)
-                
-                # Build comprehensive update query with CASE statements
-                updates = []
-                params = []
-                
-                # Quantity updates (always present)
-                qty_cases = []
-                for url, qty in zip(batch_urls, batch_quantities):
-                    qty_cases.append("WHEN %s THEN %s")
-                    params.extend([url, qty])
-                updates.append(f"quantity = CASE url_part_number {' '.join(qty_cases)} ELSE quantity END")
-                
-                # Price updates (only for non-null values) 
-                price_urls = [url for url, price in zip(batch_urls, batch_prices) if price is not None]
-                if price_urls:
-                    price_cases = []
-                    for url, price in zip(batch_urls, batch_prices):
-                        if price is not None:
-                            price_cases.append("WHEN %s THEN %s")
-                            params.extend([url, price])
-                    updates.append(f"map_price = CASE url_part_number {' '.join(price_cases)} ELSE map_price END")
-                
-                # Cost updates (only for non-null values)
-                cost_urls = [url for url, cost in zip(batch_urls, batch_costs) if cost is not None]
-                if cost_urls:
-                    cost_cases = []
-                    for url, cost in zip(batch_urls, batch_costs):
-                        if cost is not None:
-                            cost_cases.append("WHEN %s THEN %s")
-                            params.extend([url, cost])
-                    updates.append(f"sdw_cost = CASE url_part_number {' '.join(cost_cases)} ELSE sdw_cost END")
-                
-                # Timestamps
-                updates.extend([
-                    "last_modified = NOW()",
-                    "last_sdw_sync = NOW()"
-                ])
-                
-                # Build final query
-                query = f"""
-                    UPDATE {self.mode_to_table[self.mode]}
-                    SET {', '.join(updates)}
-                    WHERE url_part_number IN ({', '.join(['%s'] * len(batch_urls))})
-                    AND product_type = %s
-                """
-                
-                params.extend(batch_urls)
-                params.append(product_type)
-                
-                cursor.execute(query, params)
+                await cursor.execute("DELETE FROM _upd")
+                # INSERT IGNORE keeps the first row for a repeated url_part, like the first matching WHEN did
+                await cursor.executemany(
+                    "INSERT IGNORE INTO _upd VALUES (%s, %s, %s, %s)",
+                    list(zip(batch_urls, batch_quantities, batch_prices, batch_costs))
+                )
+                await cursor.execute(self._q[('batch_update', columns)], (product_type,))
                 batch_updates = cursor.rowcount
-                total_updates += batch_updates
-                
-                connection.commit()
-                cursor.close()
                 
                 async with self._stats_lock:
                     self._stats['batch_updates'] += 1
                     self._stats['products_updated'] += batch_updates
                 
                 logger.debug(f"Batch updated {batch_updates} products (batch {i//batch_size + 1})")
+                return batch_updates
                 
             except Exception as e:
                 logger.error(f"Error in optimized batch update: {e}")
-                if connection:
-                    try:
-                        connection.rollback()
-                    except:
-                        pass
-            finally:
-                if connection:
-                    connection.close()
+                return 0
         
-        return total_updates
+        async def _worker(batch_starts: range) -> int:
+            # One connection (and one staging table) per worker, reused across its batches
+            worker_updates = 0
+            try:
+                async with self._acquire() as connection:
+                    async with connection.cursor() as cursor:
+                        # Stage each batch in a temporary table and apply it with one JOIN UPDATE,
+                        # instead of CASE arms that repeat every url_part once per column.
+                        # IF NOT EXISTS: a worker cancelled before its finally can leave _upd on this
+                        # pooled connection; each batch starts with DELETE FROM _upd, so reusing it is safe
+                        await cursor.execute("""
+                            CREATE TEMPORARY TABLE IF NOT EXISTS _upd (
+                                url_part_number VARCHAR(255) PRIMARY KEY,
+                                quantity INT NULL,
+                                map_price DECIMAL(10,2) NULL,
+                                sdw_cost DECIMAL(10,2) NULL
+                            ) ENGINE=MEMORY
+                        """)
+                        try:
+                            for i in batch_starts:
+                                worker_updates += await _run_batch(cursor, i)
+                        finally:
+                            await cursor.execute("DROP TEMPORARY TABLE IF EXISTS _upd")
+            except Exception as e:
+                logger.error(f"Error in optimized batch update: {e}")
+            return worker_updates
+        
+        # Batches touch disjoint rows, so up to 4 workers run them concurrently,
+        # each on its own connection with its own session-scoped _upd table
+        batch_starts = range(0, len(url_parts), batch_size)
+        n_workers = min(4, len(batch_starts))
+        results = await asyncio.gather(*(_worker(batch_starts[w::n_workers]) for w in range(n_workers)))
+        return sum(results)
 
     async def get_all_url_part_numbers(self, brand: str) -> Set[str]:
         """Get URL parts for a single brand (fallback for non-cached access)."""
@@ -505,28 +777,16 @@ class DatabaseClient:
             return self._url_parts_cache[brand].copy()
         
         # Fallback to database query
-        connection = None
         try:
-            connection = await self._get_connection()
-            cursor = connection.cursor(buffered=True)
-            query = f"""
-                SELECT url_part_number 
-                FROM {self.mode_to_table[self.mode]} 
-                WHERE brand = %s 
-                  AND url_part_number IS NOT NULL 
-                  AND product_type = %s
-            """
-            cursor.execute(query, (brand, self._db_product_type()))
-            rows = cursor.fetchall()
-            url_parts = set(row[0] for row in rows)
-            cursor.close()
-            return url_parts
+            query = self._q['url_parts_for_brand']
+            async with self._acquire() as connection:
+                async with connection.cursor() as cursor:
+                    await cursor.execute(query, (brand, self._product_type_str))
+                    rows = await cursor.fetchall()
+            return set(row[0] for row in rows)
         except Exception as e:
             logger.error(f"Error in get_all_url_part_numbers: {e}")
             return set()
-        finally:
-            if connection:
-                connection.close()
 
     async def get_all_url_parts_for_brands(self, brands: List[str]) -> Dict[str, Set[str]]:
         """Get all URL part numbers for multiple brands."""
@@ -538,33 +798,22 @@ class DatabaseClient:
             return {brand: self._url_parts_cache.get(brand, set()).copy() for brand in brands}
         
         # Fallback to database query
-        connection = None
         try:
-            connection = await self._get_connection()
-            cursor = connection.cursor(buffered=True)
-            placeholders = ', '.join(['%s'] * len(brands))
-            query = f"""
-                SELECT brand, url_part_number
-                FROM {self.mode_to_table[self.mode]}
-                WHERE brand IN ({placeholders})
-                  AND url_part_number IS NOT NULL
-                  AND product_type = %s
-            """
-            cursor.execute(query, brands + [self._db_product_type()])
-            rows = cursor.fetchall()
+            padded_brands = _padded(brands)
+            query = _brands_query(self._table, 'brand, url_part_number', len(padded_brands))
+            async with self._acquire() as connection:
+                async with connection.cursor() as cursor:
+                    await cursor.execute(query, padded_brands + [self._product_type_str])
+                    rows = await cursor.fetchall()
             result = {brand: set() for brand in brands}
             for row in rows:
                 brand, url_part = row
                 if brand in result:
                     result[brand].add(url_part)
-            cursor.close()
             return result
         except Exception as e:
             logger.error(f"Error getting URL parts for multiple brands: {e}")
             return {brand: set() for brand in brands}
-        finally:
-            if connection:
-                connection.close()
 
     async def batch_update_products(self, url_parts: List[str], quantities: List[int], 
                                   prices: List[Optional[float]], costs: List[Optional[float]]) -> int:
@@ -576,40 +825,27 @@ class DatabaseClient:
         if self.no_db or not url_parts:
             return 0
         
-        product_type = self._db_product_type()
+        product_type = self._product_type_str
         batch_size = 500
         total_affected = 0
         
         for i in range(0, len(url_parts), batch_size):
             batch = url_parts[i:i+batch_size]
             
-            connection = None
             try:
-                connection = await self._get_connection()
-                cursor = connection.cursor(buffered=True)
-                placeholders = ', '.join(['%s'] * len(batch))
-                query = f"""
-                    UPDATE {self.mode_to_table[self.mode]}
-                    SET quantity = 0,
-                        last_modified = NOW(),
-                        last_sdw_sync = NOW()
-                    WHERE url_part_number IN ({placeholders})
-                    AND product_type = %s
-                """
-                params = batch + [product_type]
-                cursor.execute(query, params)
-                affected = cursor.rowcount
+                padded_batch = _padded(batch)
+                query = _zero_quantity_query(self._table, len(padded_batch))
+                params = padded_batch + [product_type]
+                async with self._acquire() as connection:
+                    async with connection.cursor() as cursor:
+                        await cursor.execute(query, params)
+                        affected = cursor.rowcount
                 total_affected += affected
-                connection.commit()
-                cursor.close()
                 
                 logger.debug(f"Set {affected} products to quantity 0 (batch {i//batch_size + 1})")
 
             except Exception as e:
                 logger.error(f"Error in batch_set_zero_quantity: {e}")
-            finally:
-                if connection:
-                    connection.close()
 
         return total_affected
 
@@ -624,141 +860,174 @@ class DatabaseClient:
         if self.no_db:
             return {"exists": False}
         
-        connection = None
         try:
-            connection = await self._get_connection()
-            cursor = connection.cursor(dictionary=True, buffered=True)
-            query = f"""
-                SELECT url_part_number, product_type, quantity, map_price, sdw_cost, last_modified
-                FROM {self.mode_to_table[self.mode]}
-                WHERE url_part_number = %s
-                  AND product_type = %s
-            """
-            cursor.execute(query, (url_part, product_type))
-            result = cursor.fetchone()
-            cursor.close()
+            query = self._q['verify']
+            async with self._acquire() as connection:
+                async with connection.cursor(aiomysql.DictCursor) as cursor:
+                    await cursor.execute(query, (url_part, product_type))
+                    result = await cursor.fetchone()
             return result or {"exists": False}
         except Exception as e:
             logger.error(f"Error in verify_updates: {e}")
             return {"error": str(e)}
-        finally:
-            if connection:
-                connection.close()
 
     async def update_map_price_by_url(self, url_part: str, price: float, product_type: str) -> None:
         """Update MAP price for one product by url_part_number."""
         if self.no_db:
             return
         
-        connection = None
         try:
-            connection = await self._get_connection()
-            cursor = connection.cursor(buffered=True)
-            query = f"""
-                UPDATE {self.mode_to_table[self.mode]}
-                SET map_price = %s, 
-                    last_modified = NOW(),
-                    last_sdw_sync = NOW()
-                WHERE url_part_number = %s
-                AND product_type = %s
-            """
-            cursor.execute(query, (price, url_part, product_type))
-            rows_affected = cursor.rowcount
-            connection.commit()
-            cursor.close()
+            query = self._q['update_map_price']
+            async with self._acquire() as connection:
+                async with connection.cursor() as cursor:
+                    await cursor.execute(query, (price, url_part, product_type))
+                    rows_affected = cursor.rowcount
             logger.debug(f"Updated map_price for {url_part} to {price}, affected {rows_affected} rows")
         except Exception as e:
             logger.error(f"Error in update_map_price_by_url: {e}")
             raise e
-        finally:
-            if connection:
-                connection.close()
 
     async def update_cost_by_url(self, url_part: str, cost: float, product_type: str) -> None:
         """Update cost for one product by url_part_number."""
         if self.no_db:
             return
         
-        connection = None
         try:
-            connection = await self._get_connection()
-            cursor = connection.cursor(buffered=True)
-            query = f"""
-                UPDATE {self.mode_to_table[self.mode]}
-                SET sdw_cost = %s, 
-                    last_modified = NOW(),
-                    last_sdw_sync = NOW()
-                WHERE url_part_number = %s
-                AND product_type = %s
-            """
-            cursor.execute(query, (cost, url_part, product_type))
-            rows_affected = cursor.rowcount
-            connection.commit()
-            cursor.close()
+            query = self._q['update_cost']
+            async with self._acquire() as connection:
+                async with connection.cursor() as cursor:
+                    await cursor.execute(query, (cost, url_part, product_type))
+                    rows_affected = cursor.rowcount
             logger.debug(f"Updated cost for {url_part} to {cost}, affected {rows_affected} rows")
         except Exception as e:
             logger.error(f"Error in update_cost_by_url: {e}")
             raise e
-        finally:
-            if connection:
-                connection.close()
 
     async def update_quantity_by_url(self, url_part: str, quantity: int, product_type: str) -> None:
         """Update quantity for one product by url_part_number."""
         if self.no_db:
             return
         
-        connection = None
         try:
-            connection = await self._get_connection()
-            cursor = connection.cursor(buffered=True)
-            query = f"""
-                UPDATE {self.mode_to_table[self.mode]}
-                SET quantity = %s, 
-                    last_modified = NOW(),
-                    last_sdw_sync = NOW()
-                WHERE url_part_number = %s
-                AND product_type = %s
-            """
-            cursor.execute(query, (quantity, url_part, product_type))
-            rows_affected = cursor.rowcount
-            connection.commit()
-            cursor.close()
+            query = self._q['update_quantity']
+            async with self._acquire() as connection:
+                async with connection.cursor() as cursor:
+                    await cursor.execute(query, (quantity, url_part, product_type))
+                    rows_affected = cursor.rowcount
             logger.debug(f"Updated quantity for {url_part} to {quantity}")
         except Exception as e:
             logger.error(f"Error in update_quantity_by_url: {e}")
-        finally:
-            if connection:
-                connection.close()
+
+    async def _bulk_update_by_urls(self, column: str, items: List[Tuple[str, float]], product_type: str) -> int:
+        """Write (url_part, value) pairs to one column with a single CASE UPDATE per 500 rows."""
+        if self.no_db or not items:
+            return 0
+
+        batch_size = 500  # 2 params per WHEN arm plus the IN() list stays well under max_allowed_packet
+        total_affected = 0
+
+        try:
+            async with self._acquire() as connection:
+                async with connection.cursor() as cursor:
+                    for i in range(0, len(items), batch_size):
+                        # A repeated url_part only ever matches its first WHEN arm
+                        padded_batch = _padded(items[i:i+batch_size])
+                        query = _case_update_query(self._table, column, len(padded_batch))
+                        params = [value for pair in padded_batch for value in pair]
+                        params += [url_part for url_part, _ in padded_batch] + [product_type]
+                        await cursor.execute(query, params)
+                        total_affected += cursor.rowcount
+            logger.debug(f"Bulk updated {column} for {len(items)} products, affected {total_affected} rows")
+        except Exception as e:
+            logger.error(f"Error bulk updating {column}: {e}")
+
+        return total_affected
+
+    async def bulk_update_quantity_by_urls(self, items: List[Tuple[str, int]], product_type: str) -> int:
+        """Update quantity for many (url_part, quantity) pairs; use instead of looping update_quantity_by_url."""
+        return await self._bulk_update_by_urls('quantity', items, product_type)
+
+    async def bulk_update_cost_by_urls(self, items: List[Tuple[str, float]], product_type: str) -> int:
+        """Update cost for many (url_part, cost) pairs; use instead of looping update_cost_by_url."""
+        return await self._bulk_update_by_urls('sdw_cost', items, product_type)
+
+    async def update_quantities_many(self, rows: List[Tuple[int, str, str]]) -> int:
+        """Apply (quantity, url_part, product_type) rows back-to-back on one connection with one commit.
+
+        For rows that can't be merged into a single statement (e.g. mixed product types);
+        otherwise prefer bulk_update_quantity_by_urls.
+        """
+        if self.no_db or not rows:
+            return 0
+
+        try:
+            async with self._acquire() as connection:
+                await connection.begin()
+                try:
+                    async with connection.cursor() as cursor:
+                        await cursor.executemany(self._q['update_quantity'], rows)
+                        rows_affected = cursor.rowcount
+                    await connection.commit()
+                except Exception:
+                    await connection.rollback()
+                    raise
+            logger.debug(f"Updated quantity for {len(rows)} products, affected {rows_affected} rows")
+            return rows_affected
+        except Exception as e:
+            logger.error(f"Error in update_quantities_many: {e}")
+            return 0
+
+    async def bulk_update_quantity_via_temp(self, pairs: List[Tuple[str, int]], product_type: str) -> int:
+        """Update quantity for many (url_part, quantity) pairs through the _upd staging table.
+
+        No per-statement parameter ceiling, so prefer this over bulk_update_quantity_by_urls for large runs.
+        """
+        if self.no_db or not pairs:
+            return 0
+        url_parts, quantities = map(list, zip(*pairs))
+        no_change = [None] * len(url_parts)
+        return await self._optimized_batch_update(url_parts, quantities, no_change, no_change,
+                                                  product_type=product_type)
+
+    @asynccontextmanager
+    async def session(self):
+        """Hold one connection and transaction across many updates, e.g.
+
+            async with db_client.session() as s:
+                for url_part, quantity in rows:
+                    await s.update_quantity(url_part, quantity, product_type)
+
+        The standalone update_*_by_url methods acquire a connection and commit per call.
+        """
+        if self.no_db:
+            yield DatabaseSession(self)
+            return
+
+        async with self._acquire() as connection:
+            await connection.begin()
+            try:
+                async with connection.cursor() as cursor:
+                    yield DatabaseSession(self, connection, cursor)
+                await connection.commit()
+            except Exception:
+                await connection.rollback()
+                raise
 
     async def bulk_update_quantity_zero(self, product_type: str, brand: str) -> None:
         """Set quantity=0 for all products of a given brand and product_type."""
         if self.no_db:
             return
 
-        connection = None
         try:
-            connection = await self._get_connection()
-            cursor = connection.cursor(buffered=True)
-            query = f"""
-                UPDATE {self.mode_to_table[self.mode]}
-                SET quantity = 0,
-                    last_modified = NOW(),
-                    last_sdw_sync = NOW()
-                WHERE product_type = %s
-                AND brand = %s
-            """
-            cursor.execute(query, (product_type, brand))
-            rows_affected = cursor.rowcount
-            connection.commit()
-            cursor.close()
+            query = self._q['zero_quantity_brand']
+            async with self._acquire() as connection:
+                async with connection.cursor() as cursor:
+                    await cursor.execute(query, (product_type, brand))
+                    rows_affected = cursor.rowcount
             logger.info(f"Bulk updated quantity=0 for brand {brand}, product_type={product_type}, rows={rows_affected}")
         except Exception as e:
             logger.error(f"Error in bulk_update_quantity_zero: {e}")
             raise e
-        finally:
-            if connection:
-                connection.close()
 
     async def get_shopify_brands(self) -> List[str]:
         """Get distinct brands from shopify_products filtered by current product_type."""
@@ -766,86 +1035,90 @@ class DatabaseClient:
             logger.info("No-db mode: Returning empty brand list")
             return []
 
-        connection = None
         try:
-            connection = await self._get_connection()
-            cursor = connection.cursor(buffered=True)
+            query = self._q['shopify_brands']
 
-            query = f"""
-                SELECT DISTINCT brand
-                FROM {self.mode_to_table[self.mode]}
-                WHERE product_type = %s
-                  AND brand IS NOT NULL
-                  AND brand != ''
-                ORDER BY brand
-            """
-
-            cursor.execute(query, (self._db_product_type(),))
-            rows = cursor.fetchall()
+            async with self._acquire() as connection:
+                async with connection.cursor() as cursor:
+                    await cursor.execute(query, (self._product_type_str,))
+                    rows = await cursor.fetchall()
             brands = [row[0] for row in rows if row[0]]
-            cursor.close()
 
-            logger.info(f"Found {len(brands)} brands in Shopify for product_type '{self._db_product_type()}'")
+            logger.info(f"Found {len(brands)} brands in Shopify for product_type '{self._product_type_str}'")
             return brands
 
         except Exception as e:
             logger.error(f"Error getting Shopify brands: {e}")
             return []
-        finally:
-            if connection:
-                connection.close()
 
     async def bulk_insert_to_sync_queue(self, url_parts: List[str], quantity: int = 0) -> int:
         """Bulk insert products to sync queue (used after trigger disable)"""
         if self.no_db or not url_parts:
             return 0
 
-        product_type = self._db_product_type()
-        connection = None
+        product_type = self._product_type_str
         total_queued = 0
 
+        if self.db_config['local_infile'] and len(url_parts) > _LOAD_DATA_THRESHOLD:
+            try:
+                return await self._load_to_sync_queue(url_parts, quantity, product_type)
+            except Exception as e:
+                logger.warning(f"LOAD DATA sync queue insert failed, falling back to batched INSERT: {e}")
+
         try:
-            connection = await self._get_connection()
-            cursor = connection.cursor(buffered=True)
-
-            # Batch insert to avoid too many params
-            batch_size = 1000
-            for i in range(0, len(url_parts), batch_size):
-                batch = url_parts[i:i+batch_size]
-                placeholders = ','.join(['%s'] * len(batch))
-
-                # Insert to sync queue - only products with shopify_id
-                query = f"""
-                    INSERT INTO shopify_sync_queue
-                    (shopify_id, variant_id, part_number, change_type, new_quantity)
-                    SELECT shopify_id, variant_id, part_number, 'quantity', %s
-                    FROM {self.mode_to_table[self.mode]}
-                    WHERE url_part_number IN ({placeholders})
-                      AND shopify_id IS NOT NULL
-                      AND variant_id IS NOT NULL
-                      AND product_type = %s
-                """
-
-                params = [quantity] + batch + [product_type]
-                cursor.execute(query, params)
-                total_queued += cursor.rowcount
-
-            connection.commit()
-            cursor.close()
-            logger.info(f"Bulk inserted {total_queued} products to sync queue")
-            return total_queued
+            async with self._acquire() as connection:
+                async with connection.cursor() as cursor:
+                    # Keep the IN() list bounded rather than packet-sized: a much longer list exceeds
+                    # range_optimizer_max_mem_size and MySQL falls back to a full table scan
+                    batch_size = 1000
+                    for i in range(0, len(url_parts), batch_size):
+                        batch = url_parts[i:i+batch_size]
+                        padded_batch = _padded(batch)
+
+                        # Insert to sync queue - only products with shopify_id
+                        query = _sync_queue_query(self._table, len(padded_batch))
+
+                        params = [quantity] + padded_batch + [product_type]
+                        await cursor.execute(query, params)
+                        total_queued += cursor.rowcount
+
+                    logger.info(f"Bulk inserted {total_queued} products to sync queue")
+                    return total_queued
 
         except Exception as e:
             logger.error(f"Error bulk inserting to sync queue: {e}")
-            if connection:
-                try:
-                    connection.rollback()
-                except:
-                    pass
             return 0
-        finally:
-            if connection:
-                connection.close()
+
+    async def _load_to_sync_queue(self, url_parts: List[str], quantity: int, product_type: str) -> int:
+        """Queue many url_parts with one INSERT ... SELECT joined against a LOAD DATA staging table.
+
+        Replaces ceil(N/1000) IN() statements with one file stream and one server-side join.
+        """
+        with _load_data_file((url_part,) for url_part in url_parts) as path:
+            # The temporary table is per-session, so every step must run on one connection
+            async with self._acquire() as connection:
+                async with connection.cursor() as cursor:
+                    await cursor.execute("""
+                        CREATE TEMPORARY TABLE tmp_sync_urls (
+                            url_part_number VARCHAR(255) PRIMARY KEY
+                        ) ENGINE=MEMORY
+                    """)
+                    try:
+                        # LOCAL implies IGNORE, so repeated url_parts are dropped by the primary key
+                        await cursor.execute("""
+                            LOAD DATA LOCAL INFILE %s INTO TABLE tmp_sync_urls
+                            CHARACTER SET utf8mb4
+                            LINES TERMINATED BY '\\n'
+                            (url_part_number)
+                        """, (path,))
+                        await cursor.execute(self._q['sync_queue_from_tmp'], (quantity, product_type))
+                        total_queued = cursor.rowcount
+                    finally:
+                        # Pooled sessions are not reset on release, so drop it explicitly
+                        await cursor.execute("DROP TEMPORARY TABLE IF EXISTS tmp_sync_urls")
+
+        logger.info(f"Bulk inserted {total_queued} products to sync queue")
+        return total_queued
 
     async def restore_ended_sale_prices(self, brands: List[str], scraped_parts: List[str]) -> int:
         """
@@ -861,157 +1134,134 @@ class DatabaseClient:
         if self.no_db or not brands:
             return 0
 
-        product_type = self._db_product_type()
-        connection = None
+        product_type = self._product_type_str
         total_restored = 0
 
         try:
-            connection = await self._get_connection()
-            cursor = connection.cursor(buffered=True)
+            if self._restore_proc_available is not False:
+                total_restored = await self._restore_via_procedure(brands, scraped_parts, product_type)
+                if total_restored is not None:
+                    if total_restored > 0:
+                        logger.info(f"✓ Restored prices for {total_restored} products (sale ended)")
+                        logger.info(f"  Triggers will queue these products for Shopify sync")
+                    else:
+                        logger.debug("No products need price restoration")
+                    return total_restored
+
+            async with self._acquire() as connection:
+                # One explicit transaction for the whole flow, so the temp-table loads and the
+                # UPDATE share a single commit instead of committing per statement under autocommit
+                await connection.begin()
+                try:
+                    async with connection.cursor() as cursor:
+                        try:
+                            total_restored = await self._restore_client_side(cursor, brands, scraped_parts,
+                                                                             product_type)
+                        finally:
+                            # Pooled sessions are not reset on release, so drop the staging tables explicitly
+                            await cursor.execute(_DROP_RESTORE_TEMP_TABLES)
+                    await connection.commit()
+                except Exception:
+                    await connection.rollback()
+                    raise
 
-            # Create temp table for scraped parts (products to EXCLUDE)
-            if scraped_parts:
-                logger.debug(f"Creating temp table with {len(scraped_parts)} scraped products to exclude...")
+            # No separate COUNT pass: the UPDATE's rowcount is the candidate count
+            if total_restored > 0:
+                logger.info(f"✓ Restored prices for {total_restored} products (sale ended)")
+                logger.info(f"  Triggers will queue these products for Shopify sync")
+            else:
+                logger.debug("No products need price restoration")
+            return total_restored
+
+        except Exception as e:
+            logger.exception(f"Error restoring ended sale prices: {e}")
+            return 0
 
-                cursor.execute("""
-                    CREATE TEMPORARY TABLE temp_scraped_exclude (
-                        url_part_number VARCHAR(255) PRIMARY KEY
-                    )
-                """)
+    async def _restore_client_side(self, cursor, brands: List[str], scraped_parts: List[str],
+                                   product_type: str) -> int:
+        """Stage brands/scraped parts in temp tables on cursor's connection and run the restore UPDATE.
 
-                # Batch insert scraped parts
-                batch_size = 1000
-                for i in range(0, len(scraped_parts), batch_size):
-                    batch = scraped_parts[i:i+batch_size]
-                    placeholders = ','.join(['(%s)'] * len(batch))
-                    insert_query = f"INSERT IGNORE INTO temp_scraped_exclude (url_part_number) VALUES {placeholders}"
-                    cursor.execute(insert_query, batch)
+        The caller owns the transaction and always drops the temp tables afterwards
+        (_DROP_RESTORE_TEMP_TABLES in a finally), so none can be left on a pooled connection.
+        """
+        # Create temp table for scraped parts (products to EXCLUDE)
+        if scraped_parts:
+            logger.debug(f"Creating temp table with {len(scraped_parts)} scraped products to exclude...")
 
-                connection.commit()
+            await cursor.execute("""
+                CREATE TEMPORARY TABLE temp_scraped_exclude (
+                    url_part_number VARCHAR(255) PRIMARY KEY
+                )
+            """)
 
+            # Batch insert scraped parts, as many per statement as fit in one packet
+            batch_size = await self._packet_batch_size(cursor)
+            for i in range(0, len(scraped_parts), batch_size):
+                batch = scraped_parts[i:i+batch_size]
+                placeholders = ','.join(['(%s)'] * len(batch))
+                insert_query = f"INSERT IGNORE INTO temp_scraped_exclude (url_part_number) VALUES {placeholders}"
+                await cursor.execute(insert_query, batch)
+
+        if len(brands) <= _INLINE_BRANDS_MAX:
+            # Few brands: filter with IN() and let the (product_type, brand) index range-scan
+            padded_brands = _padded(brands)
+            update_query = _restore_sale_prices_query(self._table, len(padded_brands),
+                                                      bool(scraped_parts))
+            await cursor.execute(update_query, padded_brands + [product_type])
+        else:
             # Create temp table for brands to process
             logger.debug(f"Creating temp table with {len(brands)} brands...")
 
-            cursor.execute("""
+            await cursor.execute("""
                 CREATE TEMPORARY TABLE temp_restore_brands (
                     brand VARCHAR(255) PRIMARY KEY
                 )
             """)
 
             # Insert brands
-            placeholders = ','.join(['(%s)'] * len(brands))
-            insert_query = f"INSERT IGNORE INTO temp_restore_brands (brand) VALUES {placeholders}"
-            cursor.execute(insert_query, brands)
-            connection.commit()
-
-            # Count candidates for price restoration
-            if scraped_parts:
-                # Exclude scraped parts using LEFT JOIN
-                count_query = f"""
-                    SELECT COUNT(*)
-                    FROM {self.mode_to_table[self.mode]} p
-                    INNER JOIN temp_restore_brands b ON p.brand = b.brand
-                    LEFT JOIN temp_scraped_exclude e ON p.url_part_number = e.url_part_number
-                    WHERE e.url_part_number IS NULL
-                    AND p.product_type = %s
-                    AND p.compare_at_price IS NOT NULL
-                    AND p.map_price IS NOT NULL
-                    AND p.compare_at_price > p.map_price
-                """
-            else:
-                # No exclusions needed
-                count_query = f"""
-                    SELECT COUNT(*)
-                    FROM {self.mode_to_table[self.mode]} p
-                    INNER JOIN temp_restore_brands b ON p.brand = b.brand
-                    WHERE p.product_type = %s
-                    AND p.compare_at_price IS NOT NULL
-                    AND p.map_price IS NOT NULL
-                    AND p.compare_at_price > p.map_price
-                """
-
-            cursor.execute(count_query, [product_type])
-            result = cursor.fetchone()
-            candidates = result[0] if result else 0
-
-            if candidates == 0:
-                logger.debug("No products need price restoration")
-                # Clean up temp tables
-                cursor.execute("DROP TEMPORARY TABLE IF EXISTS temp_restore_brands")
-                if scraped_parts:
-                    cursor.execute("DROP TEMPORARY TABLE IF EXISTS temp_scraped_exclude")
-                cursor.close()
-                return 0
-
-            logger.info(f"Found {candidates} products with ended sales (compare_at_price > map_price)")
-
-            # Perform the restoration in efficient batches
-            if scraped_parts:
-                # Use LEFT JOIN to exclude scraped parts
-                update_query = f"""
-                    UPDATE {self.mode_to_table[self.mode]} p
-                    INNER JOIN temp_restore_brands b ON p.brand = b.brand
-                    LEFT JOIN temp_scraped_exclude e ON p.url_part_number = e.url_part_number
-                    SET
-                        p.map_price = p.compare_at_price,
-                        p.compare_at_price = NULL,
-                        p.last_modified = NOW(),
-                        p.last_sdw_sync = NOW()
-                    WHERE e.url_part_number IS NULL
-                    AND p.product_type = %s
-                    AND p.compare_at_price IS NOT NULL
-                    AND p.map_price IS NOT NULL
-                    AND p.compare_at_price > p.map_price
-                """
-            else:
-                # Simple update with just brand filter
-                update_query = f"""
-                    UPDATE {self.mode_to_table[self.mode]} p
-                    INNER JOIN temp_restore_brands b ON p.brand = b.brand
-                    SET
-                        p.map_price = p.compare_at_price,
-                        p.compare_at_price = NULL,
-                        p.last_modified = NOW(),
-                        p.last_sdw_sync = NOW()
-                    WHERE p.product_type = %s
-                    AND p.compare_at_price IS NOT NULL
-                    AND p.map_price IS NOT NULL
-                    AND p.compare_at_price > p.map_price
-                """
-
-            cursor.execute(update_query, [product_type])
-            total_restored = cursor.rowcount
-            connection.commit()
-
-            # Clean up temp tables
-            cursor.execute("DROP TEMPORARY TABLE IF EXISTS temp_restore_brands")
-            if scraped_parts:
-                cursor.execute("DROP TEMPORARY TABLE IF EXISTS temp_scraped_exclude")
-
-            cursor.close()
-
-            if total_restored > 0:
-                logger.info(f"✓ Restored prices for {total_restored} products (sale ended)")
-                logger.info(f"  Triggers will queue these products for Shopify sync")
-
-            return total_restored
-
-        except Exception as e:
-            logger.error(f"Error restoring ended sale prices: {e}")
-            import traceback
-            traceback.print_exc()
-            if connection:
-                try:
-                    connection.rollback()
-                except:
-                    pass
-            return 0
-        finally:
-            if connection:
-                connection.close()
+            batch_size = await self._packet_batch_size(cursor)
+            for i in range(0, len(brands), batch_size):
+                batch = brands[i:i+batch_size]
+                placeholders = ','.join(['(%s)'] * len(batch))
+                insert_query = f"INSERT IGNORE INTO temp_restore_brands (brand) VALUES {placeholders}"
+                await cursor.execute(insert_query, batch)
+
+            # Restore in one UPDATE over the brand join, with a LEFT JOIN
+            # anti-join against scraped parts when there are any to exclude
+            update_query = self._q['restore_sale_prices_excluding' if scraped_parts else 'restore_sale_prices']
+            await cursor.execute(update_query, [product_type])
+        return cursor.rowcount
+
+    async def _restore_via_procedure(self, brands: List[str], scraped_parts: List[str],
+                                     product_type: str) -> Optional[int]:
+        """Run the whole restore server-side in one CALL (tfs-db migration 002).
+
+        Returns None when the procedure isn't installed, so the caller falls back to the client-side path.
+        """
+        try:
+            async with self._acquire() as connection:
+                async with connection.cursor() as cursor:
+                    try:
+                        # A plain CALL is one round trip; cursor.callproc would SET each argument first
+                        await cursor.execute("CALL sp_restore_ended_sale_prices(%s, %s, %s)",
+                                             (product_type, json.dumps(brands), json.dumps(scraped_parts)))
+                        (restored,) = await cursor.fetchone()
+                        while await cursor.nextset():
+                            pass
+                    finally:
+                        # The procedure drops its staging tables unless it failed part-way
+                        await cursor.execute(_DROP_RESTORE_TEMP_TABLES)
+        except aiomysql.OperationalError as e:
+            if e.args and e.args[0] == 1305:  # ER_SP_DOES_NOT_EXIST
+                logger.info("sp_restore_ended_sale_prices not installed; restoring client-side")
+                self._restore_proc_available = False
+                return None
+            raise
+        self._restore_proc_available = True
+        return int(restored or 0)
 
     async def disable_triggers(self) -> List[Dict]:
-        """Disable all triggers on shopify_products table and return DDL for restoration.
+        """Disable the triggers on shopify_products table and return DDL for restoration.
 
         IMPORTANT: Saves triggers to backup file for crash recovery.
         """
@@ -1019,108 +1269,99 @@ class DatabaseClient:
             return []
 
         saved_triggers = []
-        connection = None
 
         try:
-            connection = await self._get_connection()
-            cursor = connection.cursor(buffered=True)
-
-            # Get trigger definitions
-            cursor.execute(f"""
-                SELECT TRIGGER_NAME
-                FROM information_schema.TRIGGERS
-                WHERE EVENT_OBJECT_TABLE = '{self.mode_to_table[self.mode]}'
-                AND EVENT_OBJECT_SCHEMA = DATABASE()
-            """)
-            triggers_info = cursor.fetchall()
-
-            if triggers_info:
-                logger.info(f"Disabling {len(triggers_info)} trigger(s) for performance...")
+            async with self._acquire() as connection:
+                async with connection.cursor() as cursor:
+                    # Get every trigger definition in one query instead of a SHOW CREATE TRIGGER per trigger.
+                    # ACTION_ORDER keeps multiple triggers on the same event in their original firing order.
+                    await cursor.execute("""
+                        SELECT TRIGGER_NAME, ACTION_TIMING, EVENT_MANIPULATION,
+                               ACTION_ORIENTATION, ACTION_STATEMENT, DEFINER
+                        FROM information_schema.TRIGGERS
+                        WHERE EVENT_OBJECT_TABLE = %s
+                        AND EVENT_OBJECT_SCHEMA = DATABASE()
+                        ORDER BY EVENT_MANIPULATION, ACTION_TIMING, ACTION_ORDER
+                    """, (self._table,))
+                    triggers_info = await cursor.fetchall()
+
+                    if triggers_info:
+                        logger.info(f"Disabling {len(triggers_info)} trigger(s) for performance...")
+
+                        for trigger_name, timing, event, orientation, body, definer in triggers_info:
+                            user, host = definer.rsplit('@', 1)
+                            saved_triggers.append({
+                                'name': trigger_name,
+                                'create_sql': (
+                                    f"CREATE DEFINER=`{user}`@`{host}` TRIGGER `{trigger_name}` "
+                                    f"{timing} {event} ON `{self._table}` FOR EACH {orientation} {body}"
+                                )
+                            })
+
+                        # CRITICAL: Save to file for crash recovery (before anything is dropped)
+                        from datetime import datetime
+                        backup_file = 'triggers_backup.json'
+                        try:
+                            with open(backup_file, 'w') as f:
+                                json.dump({
+                                    'timestamp': datetime.now().isoformat(),
+                                    'mode': self.mode,
+                                    'triggers': saved_triggers
+                                }, f, indent=2)
+                        except Exception as e:
+                            logger.error(f"⚠️  Failed to save trigger backup: {e}")
+                            # Still return triggers for in-memory restoration
+                            backup_file = None
+
+                        # On a partial failure still return every definition so the caller restores the
+                        # dropped ones (restore_triggers logs and skips any that still exist).
+                        try:
+                            for trigger in saved_triggers:
+                                await cursor.execute(f"DROP TRIGGER IF EXISTS `{trigger['name']}`")
+                        except Exception as e:
+                            logger.warning(f"Could not disable all triggers: {e}")
+
+                        if backup_file:
+                            logger.info(f"✓ Disabled {len(saved_triggers)} trigger(s) (backup saved to {backup_file})")
+                        else:
+                            logger.info(f"✓ Disabled {len(saved_triggers)} trigger(s)")
 
-                for (trigger_name,) in triggers_info:
-                    try:
-                        # Get full CREATE TRIGGER statement
-                        cursor.execute(f"SHOW CREATE TRIGGER {trigger_name}")
-                        result = cursor.fetchone()
-                        if result:
-                            create_statement = result[2] if len(result) > 2 else None
-                            if create_statement:
-                                saved_triggers.append({
-                                    'name': trigger_name,
-                                    'create_sql': create_statement
-                                })
-                                # Drop the trigger
-                                cursor.execute(f"DROP TRIGGER IF EXISTS {trigger_name}")
-                                connection.commit()
-                    except Exception as e:
-                        logger.warning(f"Could not disable trigger {trigger_name}: {e}")
-
-                if saved_triggers:
-                    # CRITICAL: Save to file for crash recovery
-                    import json
-                    from datetime import datetime
-                    backup_file = 'triggers_backup.json'
-                    try:
-                        with open(backup_file, 'w') as f:
-                            json.dump({
-                                'timestamp': datetime.now().isoformat(),
-                                'mode': self.mode,
-                                'triggers': saved_triggers
-                            }, f, indent=2)
-                        logger.info(f"✓ Disabled {len(saved_triggers)} trigger(s) (backup saved to {backup_file})")
-                    except Exception as e:
-                        logger.error(f"⚠️  Failed to save trigger backup: {e}")
-                        # Still return triggers for in-memory restoration
-                        logger.info(f"✓ Disabled {len(saved_triggers)} trigger(s)")
-
-            cursor.close()
-            return saved_triggers
+                    return saved_triggers
 
         except Exception as e:
             logger.warning(f"Could not disable triggers: {e}")
             return []
-        finally:
-            if connection:
-                connection.close()
 
     async def restore_triggers(self, saved_triggers: List[Dict]) -> None:
         """Restore triggers that were disabled."""
         if self.no_db or not saved_triggers:
             return
 
-        connection = None
-
         try:
-            connection = await self._get_connection()
-            cursor = connection.cursor(buffered=True)
+            async with self._acquire() as connection:
+                async with connection.cursor() as cursor:
+                    logger.info(f"Re-enabling {len(saved_triggers)} trigger(s)...")
 
-            logger.info(f"Re-enabling {len(saved_triggers)} trigger(s)...")
+                    for trigger_info in saved_triggers:
+                        try:
+                            await cursor.execute(trigger_info['create_sql'])
+                        except Exception as e:
+                            logger.error(f"Error restoring trigger {trigger_info['name']}: {e}")
 
-            for trigger_info in saved_triggers:
-                try:
-                    cursor.execute(trigger_info['create_sql'])
-                    connection.commit()
-                except Exception as e:
-                    logger.error(f"Error restoring trigger {trigger_info['name']}: {e}")
-
-            logger.info(f"✓ Re-enabled all {len(saved_triggers)} trigger(s)")
-            cursor.close()
-
-            # Clean up backup file after successful restoration
-            import os
-            backup_file = 'triggers_backup.json'
-            if os.path.exists(backup_file):
-                try:
-                    os.remove(backup_file)
-                    logger.info(f"Cleaned up trigger backup file")
-                except Exception as e:
-                    logger.warning(f"Could not remove trigger backup: {e}")
+                    logger.info(f"✓ Re-enabled all {len(saved_triggers)} trigger(s)")
+
+                    # Clean up backup file after successful restoration
+                    import os
+                    backup_file = 'triggers_backup.json'
+                    if os.path.exists(backup_file):
+                        try:
+                            os.remove(backup_file)
+                            logger.info(f"Cleaned up trigger backup file")
+                        except Exception as e:
+                            logger.warning(f"Could not remove trigger backup: {e}")
 
         except Exception as e:
             logger.error(f"Error restoring triggers: {e}")
-        finally:
-            if connection:
-                connection.close()
 
     async def close(self) -> None:
         if self.no_db:
@@ -1134,8 +1375,10 @@ class DatabaseClient:
             logger.info(f"Final DB statistics: {dict(stats)}")
         
         try:
-            if hasattr(self.connection_pool, 'close'):
+            if self.connection_pool is not None:
                 self.connection_pool.close()
+                await self.connection_pool.wait_closed()
+                self.connection_pool = None
                 logger.info("Connection pool closed")
         except Exception as e:
             logger.error(f"Error closing connection pool: {e}")
@@ -9,6 +9,20 @@ import time
 import os
 from pathlib import Path
 
+# orjson is optional; it encodes/decodes several times faster than the stdlib json
+try:
+    import orjson
+
+    def _dumps_indented(data):
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+
+    _loads = orjson.loads  # orjson.JSONDecodeError subclasses json.JSONDecodeError
+except ImportError:
+    def _dumps_indented(data):
+        return json.dumps(data, indent=2).encode()
+
+    _loads = json.loads
+
 
 class InteractivePrompt:
     """
@@ -55,8 +69,14 @@ class InteractivePrompt:
             **prompt_data
         }
 
-        with open(request_file, 'w') as f:
-            json.dump(request_data, f, indent=2)
+        # Write to a temp file and rename over the target so readers never see a partial request
+        tmp_file = request_file.with_suffix('.json.tmp')
+        fd = os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            os.write(fd, _dumps_indented(request_data))
+        finally:
+            os.close(fd)
+        os.replace(tmp_file, request_file)
 
         # Emit event to stdout for Node.js server to detect
         event_json = json.dumps({
@@ -72,8 +92,7 @@ class InteractivePrompt:
         while True:
             if response_file.exists():
                 try:
-                    with open(response_file, 'r') as f:
-                        response = json.load(f)
+                    response = _loads(response_file.read_bytes())
 
                     # Clean up files
                     request_file.unlink(missing_ok=True)
@@ -93,8 +112,8 @@ class InteractivePrompt:
                 request_file.unlink(missing_ok=True)
                 return None
 
-            # Poll every 500ms
-            time.sleep(0.5)
+            # Poll every 100ms
+            time.sleep(0.1)
 
     def cleanup(self):
         """Clean up any leftover prompt files for this job."""
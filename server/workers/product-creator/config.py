@@ -9,8 +9,9 @@ import os
 # LOGGING SETUP
 # =============================================================================
 
+# Per-product messages are logged at DEBUG; set LOG_LEVEL=DEBUG to see them
 logging.basicConfig(
-    level=logging.INFO,
+    level=os.getenv('LOG_LEVEL', 'INFO').upper(),
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
@@ -16,11 +16,15 @@ import argparse
 import aiomysql
 import aiohttp
 import signal
-from datetime import datetime, date
+import logging
+import queue
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from logging.handlers import QueueHandler, QueueListener
 
 # Import from local directory
 from shopify_create_product import create_product_on_shopify, get_existing_product_by_handle, publish_to_sales_channels
-from config import logger, SHOPIFY_STORE_URL, SHOPIFY_ACCESS_TOKEN, PLACEHOLDER_IMAGE, DB_CONFIG
+from config import logger, PLACEHOLDER_IMAGE, DB_CONFIG
 
 # =============================================================================
 # GRACEFUL SHUTDOWN HANDLING
@@ -47,8 +51,165 @@ DEFAULT_MAX_PRODUCTS = 1000
 WHEELS_RATIO = 0.70  # 70% wheels
 TIRES_RATIO = 0.30   # 30% tires
 
+# Products created on Shopify at once. Each creation is several GraphQL calls, paced
+# together by the shared cost_limiter against the shop's GraphQL point budget.
+CREATION_CONCURRENCY = 8
+
+# DB pool sized from in-flight SQL rather than cores: roughly two statements per
+# creator plus headroom for the advisory lock, job status and limit flushes.
+# Connections are recycled before MySQL's wait_timeout can drop them.
+POOL_SIZE = max(10, CREATION_CONCURRENCY * 2 + 4)
+POOL_RECYCLE_SECONDS = 1800
+
+# Write the in-memory daily limit count back at least this often (crash safety)
+DAILY_LIMIT_FLUSH_EVERY = 25
+
+# Log an INFO progress summary every this many products (per-product lines are DEBUG)
+PROGRESS_LOG_EVERY = 50
+
+# MySQL advisory lock held for the duration of a job (see creation_lock)
+CREATION_LOCK_NAME = 'tfs_shopify_product_creation'
+
 # TESTING_MODE removed - no longer needed
 
+# =============================================================================
+# SQL
+# =============================================================================
+# Built once at import for each product table instead of on every call.
+# Product tables are schema-qualified so these run on either pool (see main()).
+
+INVENTORY_DB_NAME = 'tfs-db'
+INVENTORY_DB = f"`{INVENTORY_DB_NAME}`"
+
+
+@dataclass(frozen=True)
+class ProductKind:
+    """Table and column names for one kind of product, resolved once at import."""
+    name: str           # shopify_products.product_type: 'wheel' or 'tire'
+    table: str          # tfs-db table holding the products to create
+    shopify_table: str  # Synced copy of the Shopify catalogue, checked for duplicates
+    counter_col: str    # Per-kind created count in stats, job and daily limit rows
+    columns: tuple      # Columns read by format_wheel_data() / format_tire_data(); keep in sync
+
+
+KINDS = {
+    'wheel': ProductKind(
+        name='wheel',
+        table='wheels',
+        shopify_table='all_shopify_wheels',
+        counter_col='wheels_created',
+        columns=(
+            'url_part_number', 'part_number', 'brand', 'model', 'model_other', 'size',
+            'diameter', 'width', 'bolt_pattern', 'bolt_pattern2', 'offset', 'backspace',
+            'finish', 'short_color', 'primary_color', 'hub_bore', 'load_rating', 'weight',
+            'available_finishes', 'available_bolt_patterns', 'image', 'map_price', 'quantity',
+            'custom_build'
+        ),
+    ),
+    'tire': ProductKind(
+        name='tire',
+        table='tires',
+        shopify_table='shopify_tires',
+        counter_col='tires_created',
+        columns=(
+            'url_part_number', 'part_number', 'brand', 'model', 'size', 'image1', 'image2', 'image3',
+            'map_price', 'quantity', 'weight', 'warranty', 'tire_type', 'tire_type2',
+            'section_width', 'aspect_ratio', 'rim_diameter', 'load_index', 'load_range', 'speed_index',
+            'service_description', 'sidewall', 'tread_depth', 'max_pressure', 'inflated_diameter',
+            'inflated_width', 'ply', 'revs_per_mile', 'utqg', 'temperature', 'traction', 'tread_wear'
+        ),
+    ),
+}
+
+
+def _build_product_sql(kind):
+    needs_creation = f"""
+        FROM {INVENTORY_DB}.{kind.table} p
+        WHERE product_sync IN ('pending', 'error')
+          AND url_part_number IS NOT NULL
+          AND url_part_number != ''
+          AND part_number IS NOT NULL
+          AND part_number != ''
+          AND NOT EXISTS (
+              SELECT 1 FROM {INVENTORY_DB}.shopify_products sp
+              WHERE sp.part_number = p.part_number
+          )
+          AND NOT EXISTS (
+              SELECT 1 FROM {INVENTORY_DB}.{kind.shopify_table} st
+              WHERE st.part_number = p.part_number
+          )
+    """
+
+    return {
+        # {skip_clause} is filled in per call with the NOT IN list of processed products
+        (kind, 'next'): "SELECT " + ", ".join(kind.columns) + needs_creation + """
+          {skip_clause}
+        ORDER BY last_modified ASC
+        LIMIT 1
+        """,
+        (kind, 'count'): "SELECT COUNT(*) as count" + needs_creation,
+        # {placeholders} is filled in per call with one %s per url_part_number
+        (kind, 'synced'): f"""
+        UPDATE {INVENTORY_DB}.{kind.table}
+        SET product_sync = 'synced',
+            sync_error = NULL
+        WHERE url_part_number IN ({{placeholders}})
+        """,
+        (kind, 'error'): f"""
+        UPDATE {INVENTORY_DB}.{kind.table}
+        SET product_sync = 'error',
+            sync_error = %s
+        WHERE url_part_number = %s
+        """,
+    }
+
+
+_SQL = {key: sql for kind in KINDS.values() for key, sql in _build_product_sql(kind).items()}
+
+# Both availability counts in one round trip
+_COUNT_NEEDING_CREATION_SQL = (
+    "SELECT (" + _SQL[(KINDS['wheel'], 'count')] + ") AS wheels, "
+    "(" + _SQL[(KINDS['tire'], 'count')] + ") AS tires"
+)
+
+
+# =============================================================================
+# DAILY LIMIT STATE
+# =============================================================================
+
+@dataclass
+class LimitState:
+    """
+    Today's daily_shopify_creation_limit row, read once at job start.
+
+    Creations during the job are counted here; the database row is only written
+    by flush_daily_limit().
+    """
+    total_created: int
+    wheels_created: int
+    tires_created: int
+    limit_per_day: int
+    unflushed_wheels: int = 0
+    unflushed_tires: int = 0
+
+    @property
+    def remaining(self) -> int:
+        return self.limit_per_day - self.total_created
+
+    @property
+    def unflushed(self) -> int:
+        return self.unflushed_wheels + self.unflushed_tires
+
+    def record_created(self, kind: ProductKind):
+        """Count one created product of the given kind."""
+        self.total_created += 1
+        setattr(self, kind.counter_col, getattr(self, kind.counter_col) + 1)
+        if kind is KINDS['wheel']:
+            self.unflushed_wheels += 1
+        else:
+            self.unflushed_tires += 1
+
+
 # =============================================================================
 # DATABASE HELPERS
 # =============================================================================
@@ -56,32 +217,21 @@ TIRES_RATIO = 0.30   # 30% tires
 async def get_daily_limit_info(db_pool):
     """Get current daily limit status."""
     try:
-        query = """
-        SELECT total_created, wheels_created, tires_created, limit_per_day
-        FROM daily_shopify_creation_limit
-        WHERE date = CURDATE()
-        """
-
+        # Create today's entry if missing, then read it back on the same connection.
+        # INSERT IGNORE on the date key is race-free when two jobs start on the same day.
         async with db_pool.acquire() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cur:
-                await cur.execute(query)
-                result = await cur.fetchone()
-
-                if not result:
-                    # Create today's entry
-                    insert_query = """
-                    INSERT INTO daily_shopify_creation_limit
+                await cur.execute("""
+                    INSERT IGNORE INTO daily_shopify_creation_limit
                     (date, total_created, wheels_created, tires_created)
                     VALUES (CURDATE(), 0, 0, 0)
-                    """
-                    await cur.execute(insert_query)
-                    await conn.commit()
-                    return {
-                        'total_created': 0,
-                        'wheels_created': 0,
-                        'tires_created': 0,
-                        'limit_per_day': 1000
-                    }
+                """)
+                await cur.execute("""
+                    SELECT total_created, wheels_created, tires_created, limit_per_day
+                    FROM daily_shopify_creation_limit
+                    WHERE date = CURDATE()
+                """)
+                result = await cur.fetchone()
 
                 return result
 
@@ -90,30 +240,44 @@ async def get_daily_limit_info(db_pool):
         return None
 
 
-async def increment_daily_limit(db_pool, product_type):
-    """Increment the shared daily limit counter."""
-    try:
-        type_field = f"{product_type}s_created"  # 'wheel' -> 'wheels_created'
-
-        query = f"""
-        INSERT INTO daily_shopify_creation_limit
-        (date, total_created, {type_field})
-        VALUES (CURDATE(), 1, 1)
-        ON DUPLICATE KEY UPDATE
-            total_created = total_created + 1,
-            {type_field} = {type_field} + 1
-        """
+# Upsert rather than UPDATE: a job still running after midnight has no row for the new CURDATE() yet
+_FLUSH_DAILY_LIMIT_SQL = """
+INSERT INTO daily_shopify_creation_limit
+(date, total_created, wheels_created, tires_created)
+VALUES (CURDATE(), %s, %s, %s)
+ON DUPLICATE KEY UPDATE
+    total_created = total_created + VALUES(total_created),
+    wheels_created = wheels_created + VALUES(wheels_created),
+    tires_created = tires_created + VALUES(tires_created)
+"""
+
 
+async def flush_daily_limit(db_pool, limit_state):
+    """
+    Add products created since the last flush to the shared daily limit counter.
+
+    Creations are counted in limit_state and written here in one UPSERT instead of
+    one per product. They are credited to the day of the flush, which creates that
+    day's row if the job has run past midnight.
+    """
+    wheels = limit_state.unflushed_wheels
+    tires = limit_state.unflushed_tires
+    if wheels == 0 and tires == 0:
+        return
+
+    try:
         async with db_pool.acquire() as conn:
             async with conn.cursor() as cur:
-                await cur.execute(query)
-                await conn.commit()
+                await cur.execute(_FLUSH_DAILY_LIMIT_SQL, (wheels + tires, wheels, tires))
+
+        limit_state.unflushed_wheels -= wheels
+        limit_state.unflushed_tires -= tires
 
     except Exception as e:
-        logger.error(f"Error incrementing daily limit: {e}")
+        logger.error(f"Error updating daily limit: {e}")
 
 
-async def query_next_product_for_creation(db_pool_inventory, table_name, skip_url_parts=None):
+async def query_next_product_for_creation(db_pool_inventory, kind, skip_url_parts=None):
     """
     Query the NEXT single product that needs to be created on Shopify.
     Queries fresh from database on EACH call (no memory caching).
@@ -123,16 +287,13 @@ async def query_next_product_for_creation(db_pool_inventory, table_name, skip_ur
 
     Args:
         db_pool_inventory: Database connection pool
-        table_name: 'wheels' or 'tires'
+        kind: ProductKind to query (KINDS['wheel'] or KINDS['tire'])
         skip_url_parts: Set of url_part_numbers already processed (to avoid duplicates in one run)
 
     Returns:
         Single product dict or None if no products need creation
     """
     try:
-        # Determine the corresponding Shopify table to check
-        shopify_table = 'all_shopify_wheels' if table_name == 'wheels' else 'shopify_tires'
-
         # Build skip clause if we have processed products
         skip_clause = ""
         params = []
@@ -142,26 +303,7 @@ async def query_next_product_for_creation(db_pool_inventory, table_name, skip_ur
             params = list(skip_url_parts)
 
         # Query ONE product that needs creation (oldest first)
-        query = f"""
-        SELECT *
-        FROM {table_name}
-        WHERE product_sync IN ('pending', 'error')
-          AND url_part_number IS NOT NULL
-          AND url_part_number != ''
-          AND part_number IS NOT NULL
-          AND part_number != ''
-          AND NOT EXISTS (
-              SELECT 1 FROM shopify_products sp
-              WHERE sp.part_number = {table_name}.part_number
-          )
-          AND NOT EXISTS (
-              SELECT 1 FROM {shopify_table} st
-              WHERE st.part_number = {table_name}.part_number
-          )
-          {skip_clause}
-        ORDER BY last_modified ASC
-        LIMIT 1
-        """
+        query = _SQL[(kind, 'next')].format(skip_clause=skip_clause)
 
         async with db_pool_inventory.acquire() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cur:
@@ -170,137 +312,132 @@ async def query_next_product_for_creation(db_pool_inventory, table_name, skip_ur
                 return result
 
     except Exception as e:
-        logger.error(f"Error querying next product from {table_name}: {e}")
+        logger.error(f"Error querying next product from {kind.table}: {e}")
         return None
 
 
-async def count_products_needing_creation(db_pool_inventory, table_name):
+async def count_products_needing_creation(db_pool_inventory):
     """
-    Count how many products need to be created (for progress display).
-    Fast count query without fetching all rows.
+    Count how many wheels and tires need to be created (for progress display).
+    Fast count query without fetching all rows; both tables in one query.
+
+    Returns:
+        Tuple of (wheels_count, tires_count)
     """
     try:
-        shopify_table = 'all_shopify_wheels' if table_name == 'wheels' else 'shopify_tires'
-
-        query = f"""
-        SELECT COUNT(*) as count
-        FROM {table_name}
-        WHERE product_sync IN ('pending', 'error')
-          AND url_part_number IS NOT NULL
-          AND url_part_number != ''
-          AND part_number IS NOT NULL
-          AND part_number != ''
-          AND NOT EXISTS (
-              SELECT 1 FROM shopify_products sp
-              WHERE sp.part_number = {table_name}.part_number
-          )
-          AND NOT EXISTS (
-              SELECT 1 FROM {shopify_table} st
-              WHERE st.part_number = {table_name}.part_number
-          )
-        """
-
         async with db_pool_inventory.acquire() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cur:
-                await cur.execute(query)
+                await cur.execute(_COUNT_NEEDING_CREATION_SQL)
                 result = await cur.fetchone()
-                return result['count'] if result else 0
+                return (result['wheels'], result['tires']) if result else (0, 0)
 
     except Exception as e:
-        logger.error(f"Error counting products from {table_name}: {e}")
-        return 0
+        logger.error(f"Error counting products needing creation: {e}")
+        return 0, 0
 
 
-async def update_product_sync_status(db_pool_inventory, table_name, url_part_number, status, error_message=None):
+_INSERT_SHOPIFY_PRODUCT_SQL = f"""
+INSERT INTO {INVENTORY_DB}.shopify_products
+(brand, part_number, url_part_number, product_type, shopify_id, variant_id, handle,
+ map_price, quantity, sdw_cost, needs_sync, sync_status, source)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+
+def shopify_products_row(product_data, shopify_result, product_type):
     """
-    Update product_sync status in wheels/tires table.
-    Uses db_pool_inventory which connects to tfs-db database.
+    Build the shopify_products (tracking table) row for a created/adopted product.
 
     Args:
-        table_name: 'wheels' or 'tires'
-        url_part_number: Product URL part number
-        status: 'synced', 'pending', or 'error'
-        error_message: Error message (if status = 'error')
+        product_data: Formatted wheel/tire data dict
+        shopify_result: Result from create_product_on_shopify()
+        product_type: 'wheel' or 'tire'
     """
-    try:
-        if error_message:
-            # Error - mark as error with message
-            query = f"""
-            UPDATE {table_name}
-            SET product_sync = %s,
-                sync_error = %s
-            WHERE url_part_number = %s
-            """
-            params = (status, error_message, url_part_number)
-        else:
-            # Success or pending - update status
-            query = f"""
-            UPDATE {table_name}
-            SET product_sync = %s,
-                sync_error = NULL
-            WHERE url_part_number = %s
-            """
-            params = (status, url_part_number)
-
-        async with db_pool_inventory.acquire() as conn:
-            async with conn.cursor() as cur:
-                await cur.execute(query, params)
-                await conn.commit()
+    # Extract numeric Shopify ID from gid://shopify/Product/123456
+    shopify_id = shopify_result.get('shopify_id')
+    if isinstance(shopify_id, str) and shopify_id.startswith('gid://shopify/Product/'):
+        shopify_id = int(shopify_id.split('/')[-1])
+
+    return (
+        product_data.get('brand'),
+        product_data.get('part_number'),
+        product_data.get('url_part_number'),
+        product_type,  # 'wheel' or 'tire'
+        shopify_id,
+        shopify_result.get('variant_id'),
+        shopify_result.get('handle'),
+        float(product_data.get('map_price', 0)),
+        int(product_data.get('quantity', 0)),
+        None,  # sdw_cost (we don't have supplier_cost in our data)
+        0,  # needs_sync
+        'active',  # sync_status
+        'CWO'  # source
+    )
+
+
+async def _insert_shopify_products(cur, rows):
+    """
+    Insert rows (from shopify_products_row()) into shopify_products.
 
+    executemany sends the batch as one multi-row INSERT. If that fails, the rows
+    are retried one by one so a single bad row doesn't drop the others.
+    """
+    try:
+        await cur.executemany(_INSERT_SHOPIFY_PRODUCT_SQL, rows)
+        logger.debug("✅ Inserted %d rows into shopify_products", len(rows))
+        return
     except Exception as e:
-        logger.error(f"Error updating product_sync status: {e}")
+        logger.warning(f"Batch insert into shopify_products failed, retrying per row: {e}")
+
+    for row in rows:
+        try:
+            await cur.execute(_INSERT_SHOPIFY_PRODUCT_SQL, row)
+        except Exception as e:
+            logger.error(f"Error inserting into shopify_products ({row[1]}): {e}")
 
 
-async def insert_into_shopify_products(db_pool_inventory, product_data, shopify_result, product_type):
+async def record_results(db_pool_inventory, kind, shopify_rows, synced_parts, error_rows):
     """
-    Insert product into shopify_products table (tracking table).
-    Uses db_pool_inventory which connects to tfs-db database.
+    Write a batch of creation results to tfs-db in one transaction on one connection.
+
+    shopify_products rows are inserted first; then synced products are marked with
+    one UPDATE ... IN (...), and errors (which carry their own message) go through
+    executemany.
 
     Args:
-        product_data: Formatted wheel/tire data dict
-        shopify_result: Result from create_product_on_shopify()
-        product_type: 'wheel' or 'tire'
+        kind: ProductKind whose table the results belong to
+        shopify_rows: shopify_products rows for created/adopted products
+        synced_parts: url_part_numbers to mark as 'synced'
+        error_rows: (error_message, url_part_number) tuples to mark as 'error'
     """
+    if not shopify_rows and not synced_parts and not error_rows:
+        return
+
     try:
-        query = """
-        INSERT INTO shopify_products
-        (brand, part_number, url_part_number, product_type, shopify_id, variant_id, handle,
-         map_price, quantity, sdw_cost, needs_sync, sync_status, source)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
+        async with db_pool_inventory.acquire() as conn:
+            await conn.begin()
+            try:
+                async with conn.cursor() as cur:
+                    if shopify_rows:
+                        await _insert_shopify_products(cur, shopify_rows)
+
+                    if synced_parts:
+                        placeholders = ','.join(['%s'] * len(synced_parts))
+                        await cur.execute(
+                            _SQL[(kind, 'synced')].format(placeholders=placeholders),
+                            list(synced_parts)
+                        )
 
-        # Extract numeric Shopify ID from gid://shopify/Product/123456
-        shopify_id = shopify_result.get('shopify_id')
-        if isinstance(shopify_id, str) and shopify_id.startswith('gid://shopify/Product/'):
-            shopify_id = int(shopify_id.split('/')[-1])
-
-        values = (
-            product_data.get('brand'),
-            product_data.get('part_number'),
-            product_data.get('url_part_number'),
-            product_type,  # 'wheel' or 'tire'
-            shopify_id,
-            shopify_result.get('variant_id'),
-            shopify_result.get('handle'),
-            float(product_data.get('map_price', 0)),
-            int(product_data.get('quantity', 0)),
-            None,  # sdw_cost (we don't have supplier_cost in our data)
-            0,  # needs_sync
-            'active',  # sync_status
-            'CWO'  # source
-        )
+                    if error_rows:
+                        await cur.executemany(_SQL[(kind, 'error')], error_rows)
 
-        async with db_pool_inventory.acquire() as conn:
-            async with conn.cursor() as cur:
-                await cur.execute(query, values)
                 await conn.commit()
-
-        logger.info(f"✅ Inserted into shopify_products: {product_data.get('part_number')}")
+            except Exception:
+                await conn.rollback()
+                raise
 
     except Exception as e:
-        logger.error(f"Error inserting into shopify_products: {e}")
-        import traceback
-        logger.error(traceback.format_exc())
+        logger.error(f"Error recording creation results: {e}")
 
 
 async def update_job_pid(db_pool, job_id, pid):
@@ -315,7 +452,6 @@ async def update_job_pid(db_pool, job_id, pid):
         async with db_pool.acquire() as conn:
             async with conn.cursor() as cur:
                 await cur.execute(query, (pid, job_id))
-                await conn.commit()
         logger.info(f"📋 Registered process PID {pid} for job #{job_id}")
     except Exception as e:
         logger.error(f"Error updating job PID: {e}")
@@ -333,13 +469,17 @@ async def clear_job_pid(db_pool, job_id):
         async with db_pool.acquire() as conn:
             async with conn.cursor() as cur:
                 await cur.execute(query, (job_id,))
-                await conn.commit()
     except Exception as e:
         logger.error(f"Error clearing job PID: {e}")
 
 
-async def update_job_status(db_pool, job_id, status, products_created=None, wheels_created=None, tires_created=None, error_message=None, products_skipped=None, products_failed=None):
-    """Update the product_creation_jobs status."""
+async def update_job_status(db_pool, job_id, status, products_created=None, wheels_created=None, tires_created=None, error_message=None, products_skipped=None, products_failed=None, limit_state=None):
+    """
+    Update the product_creation_jobs status.
+
+    If limit_state has creations not yet written to daily_shopify_creation_limit,
+    they are flushed in the same transaction as the job update.
+    """
     try:
         if status == 'running':
             query = """
@@ -364,21 +504,12 @@ async def update_job_status(db_pool, job_id, status, products_created=None, whee
             """
             params = (products_created, wheels_created, tires_created, products_skipped, products_failed, job_id)
         elif status == 'completed':
-            # Get schedule_interval to calculate next_run_at
-            async with db_pool.acquire() as conn:
-                async with conn.cursor(aiomysql.DictCursor) as cur:
-                    await cur.execute(
-                        "SELECT schedule_interval FROM product_creation_jobs WHERE id = %s",
-                        (job_id,)
-                    )
-                    job_info = await cur.fetchone()
-                    schedule_interval = job_info['schedule_interval'] if job_info else 24
-
+            # next_run_at is calculated from the row's own schedule_interval
             query = """
             UPDATE product_creation_jobs
             SET status = %s,
                 completed_at = NOW(),
-                next_run_at = DATE_ADD(NOW(), INTERVAL %s HOUR),
+                next_run_at = DATE_ADD(NOW(), INTERVAL schedule_interval HOUR),
                 process_pid = NULL,
                 products_created = %s,
                 wheels_created = %s,
@@ -388,62 +519,81 @@ async def update_job_status(db_pool, job_id, status, products_created=None, whee
                 updated_at = NOW()
             WHERE id = %s
             """
-            params = (status, schedule_interval, products_created, wheels_created, tires_created, products_skipped, products_failed, job_id)
+            params = (status, products_created, wheels_created, tires_created, products_skipped, products_failed, job_id)
         elif status == 'failed':
-            # Get schedule_interval to calculate next_run_at
-            async with db_pool.acquire() as conn:
-                async with conn.cursor(aiomysql.DictCursor) as cur:
-                    await cur.execute(
-                        "SELECT schedule_interval FROM product_creation_jobs WHERE id = %s",
-                        (job_id,)
-                    )
-                    job_info = await cur.fetchone()
-                    schedule_interval = job_info['schedule_interval'] if job_info else 24
-
             query = """
             UPDATE product_creation_jobs
             SET status = %s,
                 completed_at = NOW(),
-                next_run_at = DATE_ADD(NOW(), INTERVAL %s HOUR),
+                next_run_at = DATE_ADD(NOW(), INTERVAL schedule_interval HOUR),
                 process_pid = NULL,
                 error_message = %s,
                 updated_at = NOW()
             WHERE id = %s
             """
-            params = (status, schedule_interval, error_message, job_id)
+            params = (status, error_message, job_id)
         elif status == 'terminated':
-            # Get schedule_interval to calculate next_run_at
-            async with db_pool.acquire() as conn:
-                async with conn.cursor(aiomysql.DictCursor) as cur:
-                    await cur.execute(
-                        "SELECT schedule_interval FROM product_creation_jobs WHERE id = %s",
-                        (job_id,)
-                    )
-                    job_info = await cur.fetchone()
-                    schedule_interval = job_info['schedule_interval'] if job_info else 24
-
             query = """
             UPDATE product_creation_jobs
             SET status = %s,
                 completed_at = NOW(),
-                next_run_at = DATE_ADD(NOW(), INTERVAL %s HOUR),
+                next_run_at = DATE_ADD(NOW(), INTERVAL schedule_interval HOUR),
                 process_pid = NULL,
                 updated_at = NOW()
             WHERE id = %s
             """
-            params = (status, schedule_interval, job_id)
+            params = (status, job_id)
         else:
             return
 
         async with db_pool.acquire() as conn:
             async with conn.cursor() as cur:
-                await cur.execute(query, params)
-                await conn.commit()
+                if limit_state is None or limit_state.unflushed == 0:
+                    await cur.execute(query, params)
+                    return
+
+                wheels = limit_state.unflushed_wheels
+                tires = limit_state.unflushed_tires
+                await conn.begin()
+                try:
+                    await cur.execute(_FLUSH_DAILY_LIMIT_SQL, (wheels + tires, wheels, tires))
+                    await cur.execute(query, params)
+                    await conn.commit()
+                except Exception:
+                    await conn.rollback()
+                    raise
+
+                limit_state.unflushed_wheels -= wheels
+                limit_state.unflushed_tires -= tires
 
     except Exception as e:
         logger.error(f"Error updating job status: {e}")
 
 
+@asynccontextmanager
+async def creation_lock(db_pool):
+    """
+    Hold the MySQL advisory lock that lets only one creation worker run at a time.
+
+    Workers pick "the next product needing creation" without claiming it, so two
+    overlapping runs (e.g. a manual run during a scheduled one) would create the same
+    products twice. GET_LOCK is server-wide and released automatically if the
+    connection drops, so a crashed worker never leaves it stuck.
+
+    Yields True if the lock was acquired, False if another worker holds it.
+    """
+    async with db_pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("SELECT GET_LOCK(%s, 0)", (CREATION_LOCK_NAME,))
+            (acquired,) = await cur.fetchone()
+        try:
+            yield acquired == 1
+        finally:
+            if acquired == 1:
+                async with conn.cursor() as cur:
+                    await cur.execute("SELECT RELEASE_LOCK(%s)", (CREATION_LOCK_NAME,))
+
+
 # =============================================================================
 # PRODUCT CREATION LOGIC
 # =============================================================================
@@ -798,6 +948,182 @@ async def sync_shopify_data():
     logger.info("=" * 80)
 
 
+async def create_one_product(session, product, kind, index, target):
+    """
+    Create (or adopt) a single wheel/tire on Shopify and record the result.
+
+    Args:
+        product: Row from the wheels/tires table
+        kind: ProductKind of the product
+        index: 1-based position of this product in the run (for logging)
+        target: Number of products this run aims to create (for logging)
+
+    Returns:
+        Tuple of (outcome, url_part_number, error_message, shopify_row) where outcome
+        is 'created', 'skipped' or 'failed' and shopify_row is the shopify_products row
+        to insert (None on failure). The caller writes both in batches.
+    """
+    url_part_number = product['url_part_number']
+
+    try:
+        # Format wheel/tire data
+        data = format_wheel_data(product) if kind is KINDS['wheel'] else format_tire_data(product)
+
+        logger.debug("  [%d/%d] Creating %s: %s", index, target, kind.name, data.get('title', 'Unknown'))
+
+        # Check if product already exists on Shopify via API (matches reference script)
+        # This catches products that exist on Shopify but aren't in our database
+        existing_product = await get_existing_product_by_handle(session, data['handle'])
+        if existing_product is not None:
+            logger.debug("  ⏭️  Handle '%s' exists on Shopify. Marking as synced.", data['handle'])
+
+            # Extract product details from Shopify
+            product_id = existing_product.get("id")
+            shopify_handle = existing_product.get("handle")
+            variant_edges = (existing_product.get("variants") or {}).get("edges", [])
+            shopify_variant_id = variant_edges[0]["node"]["id"] if variant_edges else None
+
+            # Ensure product is published to all sales channels
+            await publish_to_sales_channels(session, product_id)
+
+            # Extract numeric IDs for shopify_products table
+            numeric_id = int(product_id.split('/')[-1]) if product_id else None
+            numeric_variant_id = int(shopify_variant_id.split('/')[-1]) if shopify_variant_id else None
+
+            shopify_result_existing = {
+                'shopify_id': numeric_id,
+                'variant_id': numeric_variant_id,
+                'handle': shopify_handle
+            }
+
+            # Add to shopify_products since it's not there yet
+            return 'skipped', url_part_number, None, shopify_products_row(data, shopify_result_existing, kind.name)
+
+        # Create on Shopify
+        shopify_result, shopify_error = await create_product_on_shopify(session, data, data.get('image'))
+
+        if shopify_result and shopify_result.get('shopify_id'):
+            logger.debug("  ✅ Created %s with Shopify ID: %s", kind.name, shopify_result['shopify_id'])
+            # shopify_products tracking table row (this has the shopify_id)
+            return 'created', url_part_number, None, shopify_products_row(data, shopify_result, kind.name)
+
+        # Mark as error with exact Shopify error message
+        error_msg = shopify_error if shopify_error else 'Failed to create on Shopify (no error details)'
+        logger.warning("  ❌ Failed to create %s: %s", kind.name, error_msg)
+        return 'failed', url_part_number, error_msg, None
+
+    except Exception as e:
+        # Use exact exception message
+        logger.error("  ❌ Error creating %s: %s", kind.name, e)
+        return 'failed', url_part_number, str(e), None
+
+
+async def create_products_of_kind(session, db_pool_manager, db_pool_inventory, job_id, kind, target, stats, limit_state):
+    """
+    Create up to `target` wheels or tires, CREATION_CONCURRENCY at a time.
+
+    The next product is still queried fresh from the database before each dispatch
+    (so edits made during the job are respected); only the Shopify calls overlap.
+    Products that turn out to exist already or that fail don't count toward the
+    target, so another one is dispatched in their place. Outcomes are tallied into
+    `stats` as they come back; shopify_products rows and product_sync are written in
+    batches alongside the in-progress job update, and the daily limit counter is flushed every
+    DAILY_LIMIT_FLUSH_EVERY creations.
+    """
+    processed_parts = set()  # Avoid picking the same product twice in this run
+    pending = set()
+    created = 0
+    synced_parts = []  # product_sync results not yet written
+    error_rows = []
+    shopify_rows = []  # shopify_products rows not yet inserted
+
+    def tally(done):
+        nonlocal created
+        for task in done:
+            outcome, url_part_number, error_message, shopify_row = task.result()
+            if error_message is None:
+                synced_parts.append(url_part_number)
+            else:
+                error_rows.append((error_message, url_part_number))
+            if shopify_row is not None:
+                shopify_rows.append(shopify_row)
+            stats[f'{kind.table}_{outcome}'] += 1
+            stats[f'total_{outcome}'] += 1
+            if outcome == 'created':
+                created += 1
+                limit_state.record_created(kind)
+
+    async def flush_results():
+        await record_results(db_pool_inventory, kind, shopify_rows, synced_parts, error_rows)
+        shopify_rows.clear()
+        synced_parts.clear()
+        error_rows.clear()
+
+    async def report_progress(done_before):
+        if limit_state.unflushed >= DAILY_LIMIT_FLUSH_EVERY:
+            await flush_daily_limit(db_pool_manager, limit_state)
+
+        done_now = stats['total_created'] + stats['total_failed'] + stats['total_skipped']
+
+        # Per-product lines are DEBUG; keep one INFO line every PROGRESS_LOG_EVERY products
+        if done_now // PROGRESS_LOG_EVERY > done_before // PROGRESS_LOG_EVERY:
+            logger.info("  Progress: %d processed (%d created, %d skipped, %d failed) - %s %d/%d created",
+                        done_now, stats['total_created'], stats['total_skipped'], stats['total_failed'],
+                        kind.table, created, target)
+
+        # Write results and update in-progress stats every 10 products
+        if done_now // 10 > done_before // 10:
+            await flush_results()
+            await update_job_status(
+                db_pool_manager, job_id, 'in_progress',
+                stats['total_created'],
+                stats['wheels_created'],
+                stats['tires_created'],
+                products_skipped=stats['total_skipped'],
+                products_failed=stats['total_failed']
+            )
+
+    while created < target:
+        # Check for shutdown request
+        if shutdown_requested:
+            logger.warning(f"🛑 Shutdown requested - stopping {kind.table} creation gracefully")
+            break
+
+        # Wait for a slot if we're at the concurrency cap, or if the in-flight creations
+        # would already reach the target when they all succeed
+        if len(pending) >= CREATION_CONCURRENCY or created + len(pending) >= target:
+            done_before = stats['total_created'] + stats['total_failed'] + stats['total_skipped']
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            tally(done)
+            await report_progress(done_before)
+            continue
+
+        # Query NEXT product from database (fresh data every time)
+        product = await query_next_product_for_creation(
+            db_pool_inventory, kind, processed_parts
+        )
+
+        if product is None:
+            logger.info(f"  No more {kind.table} available to create (created {created}/{target})")
+            break
+
+        # Mark as processed
+        processed_parts.add(product['url_part_number'])
+
+        pending.add(asyncio.create_task(create_one_product(
+            session, product, kind, len(processed_parts), target
+        )))
+
+    # Let in-flight creations finish (also on shutdown, so nothing is left half-recorded)
+    if pending:
+        done_before = stats['total_created'] + stats['total_failed'] + stats['total_skipped']
+        done, _ = await asyncio.wait(pending)
+        tally(done)
+        await report_progress(done_before)
+
+    await flush_results()
+
+
 async def create_products_on_shopify(db_pool_manager, db_pool_inventory, job_id, max_products):
     """
     Main product creation workflow.
@@ -858,6 +1184,8 @@ async def create_products_on_shopify(db_pool_manager, db_pool_inventory, job_id,
         'total_skipped': 0
     }
 
+    limit_state = None
+
     try:
         # ================================================================
         # STEP 1: Check Daily Limit
@@ -869,11 +1197,13 @@ async def create_products_on_shopify(db_pool_manager, db_pool_inventory, job_id,
         if not limit_info:
             raise Exception("Failed to get daily limit info")
 
-        remaining = limit_info['limit_per_day'] - limit_info['total_created']
+        # Source of truth for the rest of the job; persisted by flush_daily_limit()
+        limit_state = LimitState(**limit_info)
+        remaining = limit_state.remaining
 
-        logger.info(f"  Daily Limit: {limit_info['limit_per_day']}")
-        logger.info(f"  Already Created Today: {limit_info['total_created']} " +
-                   f"({limit_info['wheels_created']} wheels, {limit_info['tires_created']} tires)")
+        logger.info(f"  Daily Limit: {limit_state.limit_per_day}")
+        logger.info(f"  Already Created Today: {limit_state.total_created} " +
+                   f"({limit_state.wheels_created} wheels, {limit_state.tires_created} tires)")
         logger.info(f"  Remaining: {remaining}")
 
         if remaining <= 0:
@@ -910,12 +1240,7 @@ async def create_products_on_shopify(db_pool_manager, db_pool_inventory, job_id,
 
         # Count products (don't load into memory - query dynamically later)
         # This ensures database changes during job are respected
-        wheels_available = await count_products_needing_creation(
-            db_pool_inventory, 'wheels'
-        )
-        tires_available = await count_products_needing_creation(
-            db_pool_inventory, 'tires'
-        )
+        wheels_available, tires_available = await count_products_needing_creation(db_pool_inventory)
 
         logger.info(f"  Found {wheels_available} wheels needing creation")
         logger.info(f"  Found {tires_available} tires needing creation")
@@ -955,270 +1280,28 @@ async def create_products_on_shopify(db_pool_manager, db_pool_inventory, job_id,
         logger.info("STEP 4: Creating products on Shopify...")
         logger.info("")
 
-        # Create aiohttp session for Shopify API calls
-        async with aiohttp.ClientSession() as session:
-            # Track processed products to avoid duplicates in this run
-            processed_wheel_parts = set()
-            processed_tire_parts = set()
-
+        # Create aiohttp session for Shopify API calls (shared by every concurrent creation
+        # so connections are kept alive across products). One pooled connection per
+        # in-flight creation is enough; DNS is cached and idle connections are kept
+        # open across the gaps between rate-limited requests.
+        connector = aiohttp.TCPConnector(
+            limit=CREATION_CONCURRENCY * 2, ttl_dns_cache=300, keepalive_timeout=75
+        )
+        async with aiohttp.ClientSession(connector=connector) as session:
             # Create wheels
             if wheels_target > 0:
                 logger.info(f"Creating wheels (target: {wheels_target})...")
-
-                wheels_created_count = 0
-
-                while wheels_created_count < wheels_target:
-                    # Check for shutdown request
-                    if shutdown_requested:
-                        logger.warning("🛑 Shutdown requested - stopping wheels creation gracefully")
-                        break
-
-                    # Query NEXT product from database (fresh data every time)
-                    product = await query_next_product_for_creation(
-                        db_pool_inventory, 'wheels', processed_wheel_parts
-                    )
-
-                    if product is None:
-                        logger.info(f"  No more wheels available to create (created {wheels_created_count}/{wheels_target})")
-                        break
-
-                    # Mark as processed
-                    processed_wheel_parts.add(product['url_part_number'])
-
-                    try:
-                        # Format wheel data
-                        wheel_data = format_wheel_data(product)
-
-                        current_count = stats['wheels_created'] + stats['wheels_skipped'] + stats['wheels_failed'] + 1
-                        logger.info(f"  [{current_count}/{wheels_target}] Creating wheel: {wheel_data.get('title', 'Unknown')}")
-
-                        # Check if product already exists on Shopify via API (matches reference script)
-                        # This catches products that exist on Shopify but aren't in our database
-                        existing_product = await get_existing_product_by_handle(session, wheel_data['handle'])
-                        if existing_product is not None:
-                            logger.info(f"  ⏭️  Handle '{wheel_data['handle']}' exists on Shopify. Marking as synced.")
-
-                            # Extract product details from Shopify
-                            product_id = existing_product.get("id")
-                            shopify_handle = existing_product.get("handle")
-                            variant_edges = (existing_product.get("variants") or {}).get("edges", [])
-                            shopify_variant_id = variant_edges[0]["node"]["id"] if variant_edges else None
-
-                            # Ensure product is published to all sales channels
-                            await publish_to_sales_channels(session, product_id)
-
-                            # Update database - mark as synced and add to shopify_products
-                            await update_product_sync_status(
-                                db_pool_inventory, 'wheels', product['url_part_number'],
-                                status='synced'
-                            )
-
-                            # Extract numeric IDs for shopify_products table
-                            numeric_id = int(product_id.split('/')[-1]) if product_id else None
-                            numeric_variant_id = int(shopify_variant_id.split('/')[-1]) if shopify_variant_id else None
-
-                            shopify_result_existing = {
-                                'shopify_id': numeric_id,
-                                'variant_id': numeric_variant_id,
-                                'handle': shopify_handle
-                            }
-
-                            # Insert into shopify_products if not already there
-                            await insert_into_shopify_products(
-                                db_pool_inventory, wheel_data, shopify_result_existing, 'wheel'
-                            )
-
-                            stats['wheels_skipped'] += 1
-                            stats['total_skipped'] += 1
-                            continue
-
-                        # Create on Shopify
-                        shopify_result, shopify_error = await create_product_on_shopify(session, wheel_data, wheel_data.get('image'))
-
-                        if shopify_result and shopify_result.get('shopify_id'):
-                            shopify_product_id = shopify_result['shopify_id']
-
-                            # Update wheels table - mark as synced (no shopify_id in wheels table)
-                            await update_product_sync_status(
-                                db_pool_inventory, 'wheels', product['url_part_number'],
-                                status='synced'
-                            )
-
-                            # Insert into shopify_products tracking table (this has the shopify_id)
-                            await insert_into_shopify_products(
-                                db_pool_inventory, wheel_data, shopify_result, 'wheel'
-                            )
-
-                            # Increment daily limit (tfs-manager)
-                            await increment_daily_limit(db_pool_manager, 'wheel')
-
-                            stats['wheels_created'] += 1
-                            stats['total_created'] += 1
-                            wheels_created_count += 1  # Increment loop counter
-
-                            logger.info(f"  ✅ Created wheel with Shopify ID: {shopify_product_id}")
-
-                            # Update in-progress stats every 10 products
-                            if (stats['total_created'] + stats['total_failed'] + stats['total_skipped']) % 10 == 0:
-                                await update_job_status(
-                                    db_pool_manager, job_id, 'in_progress',
-                                    stats['total_created'],
-                                    stats['wheels_created'],
-                                    stats['tires_created'],
-                                    products_skipped=stats['total_skipped'],
-                                    products_failed=stats['total_failed']
-                                )
-                        else:
-                            # Mark as error with exact Shopify error message
-                            error_msg = shopify_error if shopify_error else 'Failed to create on Shopify (no error details)'
-                            await update_product_sync_status(
-                                db_pool_inventory, 'wheels', product['url_part_number'],
-                                status='error', error_message=error_msg
-                            )
-
-                            stats['wheels_failed'] += 1
-                            stats['total_failed'] += 1
-                            logger.warning(f"  ❌ Failed to create wheel: {error_msg}")
-
-                    except Exception as e:
-                        # Use exact exception message
-                        await update_product_sync_status(
-                            db_pool_inventory, 'wheels', product['url_part_number'],
-                            status='error', error_message=str(e)
-                        )
-                        stats['wheels_failed'] += 1
-                        stats['total_failed'] += 1
-                        logger.error(f"  ❌ Error creating wheel: {e}")
+                await create_products_of_kind(
+                    session, db_pool_manager, db_pool_inventory, job_id, KINDS['wheel'], wheels_target, stats, limit_state
+                )
 
             # Create tires
             if tires_target > 0:
                 logger.info("")
                 logger.info(f"Creating tires (target: {tires_target})...")
-
-                tires_created_count = 0
-
-                while tires_created_count < tires_target:
-                    # Check for shutdown request
-                    if shutdown_requested:
-                        logger.warning("🛑 Shutdown requested - stopping tires creation gracefully")
-                        break
-
-                    # Query NEXT product from database (fresh data every time)
-                    product = await query_next_product_for_creation(
-                        db_pool_inventory, 'tires', processed_tire_parts
-                    )
-
-                    if product is None:
-                        logger.info(f"  No more tires available to create (created {tires_created_count}/{tires_target})")
-                        break
-
-                    # Mark as processed
-                    processed_tire_parts.add(product['url_part_number'])
-
-                    try:
-                        # Format tire data
-                        tire_data = format_tire_data(product)
-
-                        current_count = stats['tires_created'] + stats['tires_skipped'] + stats['tires_failed'] + 1
-                        logger.info(f"  [{current_count}/{tires_target}] Creating tire: {tire_data.get('title', 'Unknown')}")
-
-                        # Check if product already exists on Shopify via API (matches reference script)
-                        # This catches products that exist on Shopify but aren't in our database
-                        existing_product = await get_existing_product_by_handle(session, tire_data['handle'])
-                        if existing_product is not None:
-                            logger.info(f"  ⏭️  Handle '{tire_data['handle']}' exists on Shopify. Marking as synced.")
-
-                            # Extract product details from Shopify
-                            product_id = existing_product.get("id")
-                            shopify_handle = existing_product.get("handle")
-                            variant_edges = (existing_product.get("variants") or {}).get("edges", [])
-                            shopify_variant_id = variant_edges[0]["node"]["id"] if variant_edges else None
-
-                            # Ensure product is published to all sales channels
-                            await publish_to_sales_channels(session, product_id)
-
-                            # Update database - mark as synced and add to shopify_products
-                            await update_product_sync_status(
-                                db_pool_inventory, 'tires', product['url_part_number'],
-                                status='synced'
-                            )
-
-                            # Extract numeric IDs for shopify_products table
-                            numeric_id = int(product_id.split('/')[-1]) if product_id else None
-                            numeric_variant_id = int(shopify_variant_id.split('/')[-1]) if shopify_variant_id else None
-
-                            shopify_result_existing = {
-                                'shopify_id': numeric_id,
-                                'variant_id': numeric_variant_id,
-                                'handle': shopify_handle
-                            }
-
-                            # Insert into shopify_products if not already there
-                            await insert_into_shopify_products(
-                                db_pool_inventory, tire_data, shopify_result_existing, 'tire'
-                            )
-
-                            stats['tires_skipped'] += 1
-                            stats['total_skipped'] += 1
-                            continue
-
-                        # Create on Shopify
-                        shopify_result, shopify_error = await create_product_on_shopify(session, tire_data, tire_data.get('image'))
-
-                        if shopify_result and shopify_result.get('shopify_id'):
-                            shopify_product_id = shopify_result['shopify_id']
-
-                            # Update tires table - mark as synced (no shopify_id in tires table)
-                            await update_product_sync_status(
-                                db_pool_inventory, 'tires', product['url_part_number'],
-                                status='synced'
-                            )
-
-                            # Insert into shopify_products tracking table (this has the shopify_id)
-                            await insert_into_shopify_products(
-                                db_pool_inventory, tire_data, shopify_result, 'tire'
-                            )
-
-                            # Increment daily limit (tfs-manager)
-                            await increment_daily_limit(db_pool_manager, 'tire')
-
-                            stats['tires_created'] += 1
-                            stats['total_created'] += 1
-                            tires_created_count += 1  # Increment loop counter
-
-                            logger.info(f"  ✅ Created tire with Shopify ID: {shopify_product_id}")
-
-                            # Update in-progress stats every 10 products
-                            if (stats['total_created'] + stats['total_failed'] + stats['total_skipped']) % 10 == 0:
-                                await update_job_status(
-                                    db_pool_manager, job_id, 'in_progress',
-                                    stats['total_created'],
-                                    stats['wheels_created'],
-                                    stats['tires_created'],
-                                    products_skipped=stats['total_skipped'],
-                                    products_failed=stats['total_failed']
-                                )
-                        else:
-                            # Mark as error with exact Shopify error message
-                            error_msg = shopify_error if shopify_error else 'Failed to create on Shopify (no error details)'
-                            await update_product_sync_status(
-                                db_pool_inventory, 'tires', product['url_part_number'],
-                                status='error', error_message=error_msg
-                            )
-
-                            stats['tires_failed'] += 1
-                            stats['total_failed'] += 1
-                            logger.warning(f"  ❌ Failed to create tire: {error_msg}")
-
-                    except Exception as e:
-                        # Use exact exception message
-                        await update_product_sync_status(
-                            db_pool_inventory, 'tires', product['url_part_number'],
-                            status='error', error_message=str(e)
-                        )
-                        stats['tires_failed'] += 1
-                        stats['total_failed'] += 1
-                        logger.error(f"  ❌ Error creating tire: {e}")
+                await create_products_of_kind(
+                    session, db_pool_manager, db_pool_inventory, job_id, KINDS['tire'], tires_target, stats, limit_state
+                )
 
         # ================================================================
         # FINAL SUMMARY
@@ -1249,17 +1332,23 @@ async def create_products_on_shopify(db_pool_manager, db_pool_inventory, job_id,
             stats['wheels_created'],
             stats['tires_created'],
             products_skipped=stats['total_skipped'],
-            products_failed=stats['total_failed']
+            products_failed=stats['total_failed'],
+            limit_state=limit_state  # Remaining daily limit count goes in the same transaction
         )
 
     except Exception as e:
-        logger.error(f"Fatal error in product creation: {e}")
-        import traceback
-        logger.error(traceback.format_exc())
+        logger.exception(f"Fatal error in product creation: {e}")
 
-        await update_job_status(db_pool_manager, job_id, 'failed', error_message=str(e))
+        # Products created before the failure still count toward today's limit
+        await update_job_status(db_pool_manager, job_id, 'failed', error_message=str(e), limit_state=limit_state)
         raise
 
+    finally:
+        # Catch-all for paths where the final status update didn't take the count
+        # (it failed, or the job was cancelled)
+        if limit_state and limit_state.unflushed:
+            await flush_daily_limit(db_pool_manager, limit_state)
+
 
 # =============================================================================
 # MAIN ENTRY POINT
@@ -1276,40 +1365,30 @@ async def main():
 
     logger.info(f"Starting job #{args.job_id}, max_products={args.max_products}")
 
-    # Create TWO database connection pools
+    # tfs-manager (job status, daily limits) and tfs-db (product tables)
     db_pool_manager = None
     db_pool_inventory = None
 
     try:
-        # Pool 1: tfs-manager database (for job status, daily limits)
         manager_config = DB_CONFIG.copy()
         manager_config['db'] = os.getenv('DB_NAME', 'tfs-manager')
 
+        # Pool 1: tfs-manager database (for job status, daily limits)
         db_pool_manager = await aiomysql.create_pool(
             host=manager_config['host'],
             port=manager_config['port'],
             user=manager_config['user'],
             password=manager_config['password'],
             db=manager_config['db'],
-            minsize=2,
-            maxsize=10,
-            autocommit=True
+            minsize=CREATION_CONCURRENCY,
+            maxsize=POOL_SIZE,
+            pool_recycle=POOL_RECYCLE_SECONDS,
+            autocommit=True  # Helpers rely on this; only explicit begin() blocks commit
         )
 
-        # Pool 2: tfs-db database (for product tables)
-        inventory_config = DB_CONFIG.copy()
-        inventory_config['db'] = 'tfs-db'
-
-        db_pool_inventory = await aiomysql.create_pool(
-            host=inventory_config['host'],
-            port=inventory_config['port'],
-            user=inventory_config['user'],
-            password=inventory_config['password'],
-            db=inventory_config['db'],
-            minsize=2,
-            maxsize=10,
-            autocommit=True
-        )
+        # tfs-db (product tables) lives on the same server with the same login, and product SQL
+        # names its tables as `tfs-db`.table, so the manager pool serves both roles
+        db_pool_inventory = db_pool_manager
 
         logger.info("Database connections established")
 
@@ -1317,29 +1396,61 @@ async def main():
         current_pid = os.getpid()
         await update_job_pid(db_pool_manager, args.job_id, current_pid)
 
-        # Run product creation with both pools
-        await create_products_on_shopify(db_pool_manager, db_pool_inventory, args.job_id, args.max_products)
+        # Run product creation with both pools, unless another worker is already running
+        async with creation_lock(db_pool_inventory) as acquired:
+            if not acquired:
+                logger.warning("Another product creation worker is already running - not starting")
+                await update_job_status(
+                    db_pool_manager, args.job_id, 'failed',
+                    error_message="Another product creation job is already running"
+                )
+            else:
+                await create_products_on_shopify(db_pool_manager, db_pool_inventory, args.job_id, args.max_products)
 
     except KeyboardInterrupt:
         logger.info("Interrupted by user")
         sys.exit(0)
     except Exception as e:
-        logger.error(f"Fatal error: {e}")
-        import traceback
-        logger.error(traceback.format_exc())
+        logger.exception(f"Fatal error: {e}")
         sys.exit(1)
     finally:
         if db_pool_manager:
             db_pool_manager.close()
             await db_pool_manager.wait_closed()
-        if db_pool_inventory:
-            db_pool_inventory.close()
-            await db_pool_inventory.wait_closed()
+
+
+@contextmanager
+def queued_logging():
+    """
+    Hand log records to a background thread for the duration of the block.
+
+    The root handlers set up in config.py write to stderr synchronously; behind a
+    QueueHandler the event loop only pays for a queue put per record.
+    """
+    root = logging.getLogger()
+    handlers = root.handlers[:]
+    log_queue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+
+    for handler in handlers:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    listener.start()
+    try:
+        yield
+    finally:
+        # stop() drains whatever is still queued before the handlers go back
+        root.removeHandler(queue_handler)
+        listener.stop()
+        for handler in handlers:
+            root.addHandler(handler)
 
 
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
+        with queued_logging():
+            asyncio.run(main())
     except Exception as e:
         logger.error(f"Asyncio error: {e}")
         sys.exit(1)
@@ -13,6 +13,8 @@ Handles complete product creation with:
 import asyncio
 import aiohttp
 import json
+import time
+from functools import lru_cache
 from typing import Dict, List, Optional
 
 # Try relative imports first (when run as module), fall back to absolute
@@ -25,14 +27,33 @@ except ImportError:
 CATEGORY_ID = "gid://shopify/TaxonomyCategory/vp-1-4-20-1-1"  # Wheels category
 TIRE_CATEGORY_ID = "gid://shopify/TaxonomyCategory/vp-1-4-20-3-1"  # Tires category
 LOCATION_ID = "gid://shopify/Location/69594415255"
-THROTTLE_THRESHOLD = 120
-MAX_AVAILABLE = 2000
+MAX_AVAILABLE = 2000  # Cost bucket size assumed until Shopify reports the shop's own
+RESTORE_RATE = 100.0  # Points restored per second, likewise
+DEFAULT_QUERY_COST = 10  # Reserved for a query whose cost hasn't been reported yet (a mutation's base cost)
+MAX_THROTTLE_RETRIES = 3
+
+# Sent with every Admin API request
+SHOPIFY_HEADERS = {
+    "Content-Type": "application/json",
+    "X-Shopify-Access-Token": SHOPIFY_ACCESS_TOKEN
+}
+
+# Sales channels every product is published to
+PUBLICATION_INPUT = [
+    {"publicationId": "gid://shopify/Publication/132182868119"},  # Online Store
+    {"publicationId": "gid://shopify/Publication/133352751255"},  # Facebook & Instagram
+    {"publicationId": "gid://shopify/Publication/134946783383"},  # Google & YouTube
+    {"publicationId": "gid://shopify/Publication/154619510935"}   # Microsoft Channel
+]
 
 
 # ==============================================================================
 # HELPER FUNCTIONS (from create_wheels_2025-01.py)
 # ==============================================================================
+# The formatters below are pure and see the same few offsets/bolt patterns over
+# and over across a run, so their results are memoized.
 
+@lru_cache(maxsize=1024)
 def format_offset(offset: str) -> str:
     """Format offset with + sign if positive and append 'mm', e.g. +35mm."""
     if not offset:
@@ -49,6 +70,7 @@ def format_offset(offset: str) -> str:
     except (ValueError, TypeError):
         return offset
 
+@lru_cache(maxsize=1024)
 def format_bolt_pattern(pattern: str) -> str:
     """Convert bolt pattern from e.g. '5x4.5' -> '5x114.3' if <10, else leave it."""
     if not pattern:
@@ -64,6 +86,7 @@ def format_bolt_pattern(pattern: str) -> str:
     except:
         return pattern
 
+@lru_cache(maxsize=1024)
 def get_lug_count(bolt_pattern: str) -> Optional[str]:
     """Extract lug count from bolt pattern. Examples: '5x120' -> '5-Lug'"""
     if not bolt_pattern:
@@ -456,17 +479,114 @@ def prepare_metafields_tire(tire_data: Dict) -> List[Dict]:
 # RATE LIMITING
 # ==============================================================================
 
-async def handle_rate_limiting(throttle_status: Dict):
-    """Handle Shopify GraphQL rate limiting."""
-    if not throttle_status:
-        return
-    currently_available = throttle_status.get('currentlyAvailable', MAX_AVAILABLE)
-    restore_rate = throttle_status.get('restoreRate', 100.0)
-    if currently_available < THROTTLE_THRESHOLD:
-        needed = MAX_AVAILABLE - currently_available
-        wait_time = needed / restore_rate
-        logger.info(f"[RateLimit] Points low ({currently_available}), waiting {wait_time:.2f}s...")
-        await asyncio.sleep(wait_time)
+class CostBucket:
+    """
+    Client-side mirror of Shopify's GraphQL cost bucket.
+
+    The GraphQL Admin API limits query cost points, not request count. acquire()
+    reserves a query's expected cost (its last requestedQueryCost) and waits until
+    enough points have been restored; update() resyncs the level, size and restore
+    rate from each response's extensions.cost.throttleStatus. Shared by every
+    request in the process, so concurrent product creations together spend the
+    shop's actual point budget without being throttled.
+    """
+
+    def __init__(self, maximum: float = MAX_AVAILABLE, restore_rate: float = RESTORE_RATE):
+        self.maximum = maximum
+        self.restore_rate = restore_rate
+        self._available = maximum
+        self._reserved = 0.0  # Points held by requests still in flight
+        self._updated = time.monotonic()
+        self._costs: Dict[str, float] = {}  # Query text -> last requestedQueryCost
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, query: str) -> float:
+        """Wait until the bucket covers the query's expected cost, then reserve and return it."""
+        cost = min(self._costs.get(query, DEFAULT_QUERY_COST), self.maximum)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._available = min(self.maximum, self._available + (now - self._updated) * self.restore_rate)
+                self._updated = now
+                if self._available >= cost:
+                    self._available -= cost
+                    self._reserved += cost
+                    return cost
+                await asyncio.sleep((cost - self._available) / self.restore_rate)
+
+    def update(self, query: str, reserved: float, cost: Dict):
+        """Release a reservation and resync from a response's extensions.cost (empty if none)."""
+        self._reserved -= reserved
+        if cost.get("requestedQueryCost") is not None:
+            self._costs[query] = cost["requestedQueryCost"]
+        throttle = cost.get("throttleStatus")
+        if throttle:
+            self.maximum = throttle.get("maximumAvailable", self.maximum)
+            self.restore_rate = throttle.get("restoreRate") or self.restore_rate
+            # Shopify's level already includes this request, but not what other in-flight requests hold
+            self._available = throttle.get("currentlyAvailable", self._available) - self._reserved
+            self._updated = time.monotonic()
+
+
+cost_limiter = CostBucket()
+
+
+def _is_throttled(data: Dict) -> bool:
+    """True if a GraphQL response was rejected by Shopify's cost limit."""
+    errors = data.get("errors")
+    if not isinstance(errors, list):
+        return False
+    return any((err.get("extensions") or {}).get("code") == "THROTTLED" for err in errors)
+
+
+async def post_graphql(session: aiohttp.ClientSession, payload: Dict) -> Dict:
+    """
+    POST a GraphQL request, retrying when Shopify throttles it.
+
+    Every attempt first reserves its expected cost from cost_limiter, which is
+    resynced from the response's throttleStatus.
+
+    Throttled requests are not executed by Shopify, so they are safe to resend.
+    HTTP 429 waits for Retry-After; a THROTTLED GraphQL error waits until the
+    bucket has restored enough points for the requested cost. Both fall back to
+    exponential backoff. After MAX_THROTTLE_RETRIES the last response is returned.
+    """
+    query = payload["query"]
+    for attempt in range(MAX_THROTTLE_RETRIES + 1):
+        backoff = 2 ** attempt
+        reserved = await cost_limiter.acquire(query)
+        data, cost, retry_after = None, {}, None
+        try:
+            async with session.post(SHOPIFY_STORE_URL, headers=SHOPIFY_HEADERS, json=payload) as resp:
+                if resp.status == 429 and attempt < MAX_THROTTLE_RETRIES:
+                    retry_after = resp.headers.get("Retry-After", backoff)
+                else:
+                    data = await resp.json()
+                    cost = data.get("extensions", {}).get("cost", {})
+        finally:
+            cost_limiter.update(query, reserved, cost)
+
+        if data is None:
+            try:
+                wait_time = float(retry_after)
+            except ValueError:
+                wait_time = backoff
+            logger.warning(f"[RateLimit] HTTP 429, retrying in {wait_time:.2f}s (attempt {attempt + 1})")
+            await asyncio.sleep(wait_time)
+            continue
+
+        throttle = cost.get("throttleStatus", {})
+
+        if _is_throttled(data) and attempt < MAX_THROTTLE_RETRIES:
+            wait_time = backoff
+            if throttle:
+                needed = cost.get("requestedQueryCost", 0) - throttle.get("currentlyAvailable", 0)
+                wait_time = max(needed / throttle.get("restoreRate", RESTORE_RATE), backoff)
+            logger.warning(f"[RateLimit] Throttled, retrying in {wait_time:.2f}s (attempt {attempt + 1})")
+            await asyncio.sleep(wait_time)
+            continue
+
+        return data
 
 
 # ==============================================================================
@@ -498,21 +618,10 @@ async def get_existing_product_by_handle(session: aiohttp.ClientSession, handle:
     }
     """
     variables = {"handle": handle}
-    headers = {
-        "Content-Type": "application/json",
-        "X-Shopify-Access-Token": SHOPIFY_ACCESS_TOKEN
-    }
     try:
-        async with session.post(
-            SHOPIFY_STORE_URL,
-            headers=headers,
-            json={"query": query, "variables": variables}
-        ) as resp:
-            data = await resp.json()
-            throttle = data.get("extensions", {}).get("cost", {}).get("throttleStatus", {})
-            await handle_rate_limiting(throttle)
-            product = data.get("data", {}).get("productByHandle")
-            return product
+        data = await post_graphql(session, {"query": query, "variables": variables})
+        product = data.get("data", {}).get("productByHandle")
+        return product
     except Exception as e:
         logger.error(f"Error checking if product exists by handle: {str(e)}")
         return None
@@ -566,9 +675,10 @@ async def create_product_asynchronous_mutation(wheel_data: Dict):
         if value is not None and str(value).strip():
             metafields.append(mf)
         else:
-            logger.warning(f"Skipping empty metafield: {mf['namespace']}.{mf['key']} (value={repr(value)})")
+            logger.debug("Skipping empty metafield: %s.%s (value=%r)", mf['namespace'], mf['key'], value)
 
-    logger.info(f"Product {wheel_data.get('part_number')} ({product_type}): {len(metafields)} metafields (filtered from {len(metafields_raw)})")
+    logger.debug("Product %s (%s): %d metafields (filtered from %d)",
+                 wheel_data.get('part_number'), product_type, len(metafields), len(metafields_raw))
 
     price_str = str(wheel_data.get('map_price', '0.00'))
 
@@ -676,21 +786,12 @@ async def update_inventory_item(session: aiohttp.ClientSession, inventory_item_i
             ]
         }
     }
-    headers = {
-        "Content-Type": "application/json",
-        "X-Shopify-Access-Token": SHOPIFY_ACCESS_TOKEN
-    }
-    async with session.post(
-        SHOPIFY_STORE_URL, headers=headers, json={"query": mutation, "variables": variables}
-    ) as resp:
-        data = await resp.json()
-        throttle = data.get("extensions", {}).get("cost", {}).get("throttleStatus", {})
-        await handle_rate_limiting(throttle)
-        user_errors = data.get("data", {}).get("inventoryAdjustQuantities", {}).get("userErrors")
-        if user_errors:
-            logger.error(f"inventoryAdjustQuantities errors: {user_errors}")
-            return False
-        return True
+    data = await post_graphql(session, {"query": mutation, "variables": variables})
+    user_errors = data.get("data", {}).get("inventoryAdjustQuantities", {}).get("userErrors")
+    if user_errors:
+        logger.error(f"inventoryAdjustQuantities errors: {user_errors}")
+        return False
+    return True
 
 async def product_create_media_mutation(session: aiohttp.ClientSession, product_id: str, url: str, alt_text: str):
     """Add media/image to a product."""
@@ -716,28 +817,12 @@ async def product_create_media_mutation(session: aiohttp.ClientSession, product_
             "originalSource": url
         }]
     }
-    headers = {
-        "Content-Type": "application/json",
-        "X-Shopify-Access-Token": SHOPIFY_ACCESS_TOKEN
-    }
-    async with session.post(
-        SHOPIFY_STORE_URL, headers=headers, json={"query": mutation, "variables": variables}
-    ) as resp:
-        data = await resp.json()
-        throttle = data.get("extensions", {}).get("cost", {}).get("throttleStatus", {})
-        await handle_rate_limiting(throttle)
-        if 'errors' in data:
-            logger.error(f"Error uploading media: {data['errors']}")
+    data = await post_graphql(session, {"query": mutation, "variables": variables})
+    if 'errors' in data:
+        logger.error(f"Error uploading media: {data['errors']}")
 
 async def publish_to_sales_channels(session: aiohttp.ClientSession, product_id: str):
     """Publish a product to specific sales channels."""
-    publication_ids = [
-        "gid://shopify/Publication/132182868119",  # Online Store
-        "gid://shopify/Publication/133352751255",  # Facebook & Instagram
-        "gid://shopify/Publication/134946783383",  # Google & YouTube
-        "gid://shopify/Publication/154619510935"   # Microsoft Channel
-    ]
-
     mutation = """
     mutation publishablePublish($id: ID!, $input: [PublicationInput!]!) {
       publishablePublish(id: $id, input: $input) {
@@ -751,27 +836,17 @@ async def publish_to_sales_channels(session: aiohttp.ClientSession, product_id:
 
     variables = {
         "id": product_id,
-        "input": [{"publicationId": pub_id} for pub_id in publication_ids]
-    }
-
-    headers = {
-        "Content-Type": "application/json",
-        "X-Shopify-Access-Token": SHOPIFY_ACCESS_TOKEN
+        "input": PUBLICATION_INPUT
     }
 
     try:
-        async with session.post(
-            SHOPIFY_STORE_URL, headers=headers, json={"query": mutation, "variables": variables}
-        ) as resp:
-            data = await resp.json()
-            throttle = data.get("extensions", {}).get("cost", {}).get("throttleStatus", {})
-            await handle_rate_limiting(throttle)
-            user_errors = data.get("data", {}).get("publishablePublish", {}).get("userErrors")
-            if user_errors:
-                logger.warning(f"Publishing errors for product {product_id}: {user_errors}")
-                return False
-            logger.info(f"✅ Published product {product_id} to sales channels")
-            return True
+        data = await post_graphql(session, {"query": mutation, "variables": variables})
+        user_errors = data.get("data", {}).get("publishablePublish", {}).get("userErrors")
+        if user_errors:
+            logger.warning(f"Publishing errors for product {product_id}: {user_errors}")
+            return False
+        logger.debug("✅ Published product %s to sales channels", product_id)
+        return True
     except Exception as e:
         logger.error(f"Failed to publish product {product_id}: {str(e)}")
         return False
@@ -798,98 +873,85 @@ async def create_product_on_shopify(session: aiohttp.ClientSession, wheel_data:
         - error_message: String with error details if failed, None if successful
     """
     try:
-        logger.info(f"Creating product: {wheel_data.get('part_number')}")
+        logger.debug("Creating product: %s", wheel_data.get('part_number'))
 
         # Build mutation
         mutation, variables = await create_product_asynchronous_mutation(wheel_data)
 
-        headers = {
-            "Content-Type": "application/json",
-            "X-Shopify-Access-Token": SHOPIFY_ACCESS_TOKEN
-        }
-
-        async with session.post(
-            SHOPIFY_STORE_URL, headers=headers, json={"query": mutation, "variables": variables}
-        ) as resp:
-            result = await resp.json()
-            throttle = result.get("extensions", {}).get("cost", {}).get("throttleStatus", {})
-            await handle_rate_limiting(throttle)
-
-            user_errors = result.get("data", {}).get("productSet", {}).get("userErrors")
-            if 'errors' in result or (user_errors and len(user_errors) > 0):
-                # Format error message for database
-                errors = result.get('errors') or user_errors
-                error_message = json.dumps(errors, indent=2)
-                logger.error(f"productSet errors for SKU={wheel_data['part_number']}:\n{error_message}")
-                return None, error_message
-
-            product_data = result["data"]["productSet"]["product"]
-            product_id = product_data["id"]
-            shopify_handle = product_data["handle"]
-
-            # Extract variant information
-            variant_node = product_data["variants"]["edges"][0]["node"]
-            shopify_variant_id = variant_node["id"]
-            inventory_item_id = variant_node["inventoryItem"]["id"]
-
-            logger.info(f"✅ Created product {product_id} for SKU={wheel_data['part_number']}")
-
-            # Publish to all sales channels
-            await publish_to_sales_channels(session, product_id)
-
-            # Update inventory if needed
-            qty = int(wheel_data.get("quantity", 0))
-            if qty > 0:
-                ok = await update_inventory_item(session, inventory_item_id, qty)
-                if not ok:
-                    logger.error(f"Could not adjust inventory for SKU={wheel_data['part_number']}")
-
-            # Add product images
-            # Detect if this is a tire (tires have multiple images: image3, image1, image2)
-            is_tire = not wheel_data.get('finish') and wheel_data.get('size')
-
-            if is_tire:
-                # Tire: Add multiple images in order: image3, image1, image2
-                alt_text = f"{wheel_data['brand']} {wheel_data['model']} {wheel_data.get('size', '')} Tire"
-
-                # Process images in order (from reference script lines 694-795)
-                for image_field in ['image3', 'image1', 'image2']:
-                    image_url = wheel_data.get(image_field)
-                    if image_url:
-                        await product_create_media_mutation(
-                            session,
-                            product_id,
-                            image_url,
-                            alt_text.strip()
-                        )
-            else:
-                # Wheel: Add single image
-                alt_text = f"{wheel_data['brand']} {wheel_data['model']} {wheel_data['finish']}"
-
-                if gcs_image_url:
-                    await product_create_media_mutation(
-                        session,
-                        product_id,
-                        gcs_image_url,
-                        alt_text.strip()
-                    )
-                elif wheel_data.get('image'):
+        result = await post_graphql(session, {"query": mutation, "variables": variables})
+
+        user_errors = result.get("data", {}).get("productSet", {}).get("userErrors")
+        if 'errors' in result or (user_errors and len(user_errors) > 0):
+            # Format error message for database
+            errors = result.get('errors') or user_errors
+            error_message = json.dumps(errors, indent=2)
+            logger.error(f"productSet errors for SKU={wheel_data['part_number']}:\n{error_message}")
+            return None, error_message
+
+        product_data = result["data"]["productSet"]["product"]
+        product_id = product_data["id"]
+        shopify_handle = product_data["handle"]
+
+        # Extract variant information
+        variant_node = product_data["variants"]["edges"][0]["node"]
+        shopify_variant_id = variant_node["id"]
+        inventory_item_id = variant_node["inventoryItem"]["id"]
+
+        logger.debug("✅ Created product %s for SKU=%s", product_id, wheel_data['part_number'])
+
+        # Publish to all sales channels
+        await publish_to_sales_channels(session, product_id)
+
+        # Update inventory if needed
+        qty = int(wheel_data.get("quantity", 0))
+        if qty > 0:
+            ok = await update_inventory_item(session, inventory_item_id, qty)
+            if not ok:
+                logger.error(f"Could not adjust inventory for SKU={wheel_data['part_number']}")
+
+        # Add product images
+        # Detect if this is a tire (tires have multiple images: image3, image1, image2)
+        is_tire = not wheel_data.get('finish') and wheel_data.get('size')
+
+        if is_tire:
+            # Tire: Add multiple images in order: image3, image1, image2
+            alt_text = f"{wheel_data['brand']} {wheel_data['model']} {wheel_data.get('size', '')} Tire"
+
+            # Process images in order (from reference script lines 694-795)
+            for image_field in ['image3', 'image1', 'image2']:
+                image_url = wheel_data.get(image_field)
+                if image_url:
                     await product_create_media_mutation(
                         session,
                         product_id,
-                        wheel_data['image'],
+                        image_url,
                         alt_text.strip()
                     )
-
-            return {
-                'shopify_id': int(product_id.split('/')[-1]),
-                'variant_id': int(shopify_variant_id.split('/')[-1]),
-                'handle': shopify_handle
-            }, None
+        else:
+            # Wheel: Add single image
+            alt_text = f"{wheel_data['brand']} {wheel_data['model']} {wheel_data['finish']}"
+
+            if gcs_image_url:
+                await product_create_media_mutation(
+                    session,
+                    product_id,
+                    gcs_image_url,
+                    alt_text.strip()
+                )
+            elif wheel_data.get('image'):
+                await product_create_media_mutation(
+                    session,
+                    product_id,
+                    wheel_data['image'],
+                    alt_text.strip()
+                )
+
+        return {
+            'shopify_id': int(product_id.split('/')[-1]),
+            'variant_id': int(shopify_variant_id.split('/')[-1]),
+            'handle': shopify_handle
+        }, None
 
     except Exception as e:
-        logger.error(f"Exception creating product: {e}")
-        import traceback
-        error_traceback = traceback.format_exc()
-        logger.error(error_traceback)
+        logger.exception(f"Exception creating product: {e}")
         return None, str(e)
@@ -1,15 +1,26 @@
-import mysql.connector
-from mysql.connector import pooling
-from typing import Set, Optional, Dict, List, Tuple
+import aiomysql
+from typing import AbstractSet, Set, Optional, Dict, List, Tuple
 import asyncio
 import os
-from functools import partial
+import json
 import logging
+import re
+import tempfile
 from dotenv import load_dotenv
 import pathlib
-from collections import defaultdict
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from itertools import chain, combinations, groupby, starmap
+from operator import itemgetter
 import time
 
+try:
+    from xxhash import xxh3_64_intdigest as _fingerprint
+except ImportError:
+    # Process-local fallback; the cache never outlives the process so randomized str hashing is fine
+    _fingerprint = hash
+
 # Load environment variables - look in multiple locations
 from pathlib import Path as EnvPath
 script_dir = EnvPath(__file__).parent.parent.parent  # Go up to TFS Manager root
@@ -26,25 +37,178 @@ for env_path in env_paths:
 
 logger = logging.getLogger(__name__)
 
+# Precompiled matchers for scraped numeric fields (quantity is an integer, prices are decimals).
+# No sign and no nan/inf: a negative quantity parses as 0 and a negative price/cost as None,
+# the same as _parse_price/_parse_product in server/workers/db.py
+_NUM_RE = re.compile(r'^\d+(?:\.\d+)?$').match
+_INT_RE = re.compile(r'^\d+$').match
+
+# Shared immutable fallback for cache misses (avoids allocating a new empty set per lookup)
+_EMPTY = frozenset()
+
+# Row accessors for (brand, url_part_number, quantity, map_price, sdw_cost) result tuples
+_first = itemgetter(0)
+_second = itemgetter(1)
+_values = itemgetter(2, 3, 4)
+
+# Per-call statistics counter; batch tasks inherit it from the calling coroutine's context
+_stats_ctx: ContextVar[Optional[Counter]] = ContextVar('db_stats', default=None)
+
+# Columns update_fields_by_url may write, in SET order
+_UPDATABLE_FIELDS = ('quantity', 'map_price', 'sdw_cost')
+
+# Character set/collation of the shopify_products text columns (the repo-wide table default).
+# JSON_TABLE columns otherwise come out as utf8mb4_0900_ai_ci, and comparing them with the
+# table's brand/url_part_number either fails with "Illegal mix of collations" or converts
+# the indexed column, which turns an index lookup into a full scan.
+_TABLE_COLLATION = 'CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci'
+
+# Above this many new products, _store_new_products ingests via LOAD DATA LOCAL INFILE
+# (only when DB_LOCAL_INFILE is set)
+_LOAD_DATA_THRESHOLD = 2000
+
+# not_scraped columns written by _store_new_products, in file/VALUES order
+_NOT_SCRAPED_COLUMNS = ('brand', 'part_number', 'url_part_number', 'quantity',
+                        'map_price', 'sdw_cost', 'url', 'product_type')
+
+# Escapes for LOAD DATA's default FIELDS ESCAPED BY '\\'
+_TSV_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def _tsv_field(value) -> str:
+    """Format one value for a LOAD DATA tab-separated file (None -> \\N)."""
+    if value is None:
+        return '\\N'
+    return str(value).translate(_TSV_ESCAPES)
+
+
+@contextmanager
+def _load_data_file(rows):
+    """Write rows (tuples in column order) to a temporary LOAD DATA file and yield its path."""
+    with tempfile.NamedTemporaryFile('w', encoding='utf-8', suffix='.tsv') as f:
+        f.writelines('\t'.join(map(_tsv_field, row)) + '\n' for row in rows)
+        f.flush()
+        yield f.name
+
+
+# Sentinel for "field not provided" in update_fields_by_url (None is a valid value to write)
+_UNSET = object()
+
+
+def _parse_product(p: Dict, _num=_NUM_RE, _int=_INT_RE) -> Optional[Tuple[str, int, Optional[float], Optional[float]]]:
+    """Parse a scraped product into (url_part, quantity, price, cost), or None without a url_part."""
+    get = p.get
+    url_part = get('url_part_number')
+    if not url_part:
+        return None
+
+    qty_str = get('quantity')
+    if qty_str:
+        qty_str = qty_str.replace(',', '')
+        quantity = int(qty_str) if _int(qty_str) else 0
+    else:
+        quantity = 0
+
+    price_str = get('price_map')
+    price = float(price_str) if price_str and _num(price_str) else None
+
+    cost_str = get('cost')
+    cost = float(cost_str) if cost_str and _num(cost_str) else None
+
+    return url_part, quantity, price, cost
+
+
+def _supports_values_rows(version: str) -> bool:
+    """True if a SELECT VERSION() string is MySQL 8.0.19+, which added VALUES ROW(...) table constructors."""
+    if 'mariadb' in version.lower():
+        return False
+    match = re.match(r'(\d+)\.(\d+)\.(\d+)', version)
+    return bool(match) and tuple(map(int, match.groups())) >= (8, 0, 19)
+
+
+def _values_update(table: str, url_parts: List[str], quantities: List[Optional[int]],
+                   prices: List[Optional[float]], costs: List[Optional[float]],
+                   product_type: str) -> Tuple[Optional[str], List]:
+    """Build the batch UPDATE as a join against a VALUES ROW(...) derived table (MySQL 8.0.19+).
+
+    One row (and four parameters) per product instead of CASE lists that repeat every URL;
+    a None value leaves that column unchanged.
+    """
+    rows_clause = ', '.join(['ROW(%s, %s, %s, %s)'] * len(url_parts))
+    query = f"""
+        UPDATE {table} t
+        JOIN (VALUES {rows_clause}) AS v(url, qty, price, cost)
+          ON t.url_part_number = v.url
+        SET t.quantity = COALESCE(v.qty, t.quantity),
+            t.map_price = COALESCE(v.price, t.map_price),
+            t.sdw_cost = COALESCE(v.cost, t.sdw_cost),
+            t.last_modified = NOW(),
+            t.last_sdw_sync = NOW()
+        WHERE t.product_type = %s
+    """
+    params = list(chain.from_iterable(zip(url_parts, quantities, prices, costs)))
+    params.append(product_type)
+    return query, params
+
+
+def _case_update(table: str, url_parts: List[str], quantities: List[Optional[int]],
+                 prices: List[Optional[float]], costs: List[Optional[float]],
+                 product_type: str) -> Tuple[Optional[str], List]:
+    """Build the pre-8.0.19 batch UPDATE: one CASE per column over the rows that set it.
+
+    Returns (None, []) when no row sets any column.
+    """
+    sets = []
+    params = []
+    for column, values in zip(_UPDATABLE_FIELDS, (quantities, prices, costs)):
+        arms = [(url, value) for url, value in zip(url_parts, values) if value is not None]
+        if arms:
+            sets.append(f"{column} = CASE url_part_number {' '.join(['WHEN %s THEN %s'] * len(arms))} ELSE {column} END")
+            params.extend(chain.from_iterable(arms))
+    if not sets:
+        return None, []
+    query = f"""
+        UPDATE {table}
+        SET {', '.join(sets)},
+            last_modified = NOW(),
+            last_sdw_sync = NOW()
+        WHERE url_part_number IN ({', '.join(['%s'] * len(url_parts))})
+        AND product_type = %s
+    """
+    return query, params + list(url_parts) + [product_type]
+
+
+def _row_hash(quantity, price, cost) -> int:
+    """Hash of the mutable columns of a product row (DB Decimals are normalized to float)."""
+    return hash((
+        int(quantity) if quantity is not None else None,
+        float(price) if price is not None else None,
+        float(cost) if cost is not None else None,
+    ))
+
+
 class DatabaseClient:
     def __init__(self, no_db: bool = False):
         self.no_db = no_db
         self.mode = None  # 'wheels' or 'tires'
         print("Initializing DatabaseClient..." + (" (no-db mode)" if no_db else ""))
         
-        # Optimized database configuration
+        # Optimized database configuration (aiomysql pool - native asyncio I/O)
         self.db_config = {
             'host': os.environ.get('DB_HOST'),
             'user': os.environ.get('DB_USER'),
             'password': os.environ.get('DB_PASSWORD'),
-            'database': os.environ.get('DB_NAME'),
-            'pool_size': 20,  # Reduced pool size but optimized usage
-            'pool_reset_session': True,
-            'connection_timeout': 120,
+            'db': os.environ.get('DB_NAME'),
+            'minsize': 5,
+            'maxsize': 20,
+            'connect_timeout': 120,
+            'pool_recycle': 600,  # Recycle connections older than 10 minutes
+            # aiomysql does not reset session state on release (no COM_RESET_CONNECTION per acquire),
+            # so nothing here may rely on session variables or temporary tables surviving a release.
             'autocommit': True,
-            'buffered': True,  # Add buffered cursors for better performance
-            'use_unicode': True,
-            'charset': 'utf8mb4'
+            'charset': 'utf8mb4',
+            # Opt-in LOAD DATA path in _store_new_products; the server must allow local_infile too
+            'local_infile': os.environ.get('DB_LOCAL_INFILE', '').lower() in ('1', 'true', 'yes'),
         }
         
         self.mode_to_table = {
@@ -54,22 +218,21 @@ class DatabaseClient:
         
         self.connection_pool = None
         self.db_lock = asyncio.Lock()
+
+        # Whether the server accepts VALUES ROW(...) (MySQL 8.0.19+); checked once in init()
+        self._values_rows = False
         
         # In-memory cache for URL parts - optimizes lookups
         self._url_parts_cache = {}  # brand -> set of url_parts
+        self._row_hash_cache = {}  # url_part fingerprint -> _row_hash(quantity, map_price, sdw_cost) last seen in DB
         self._cache_loaded = False
         
         # Statistics tracking
-        self._stats = defaultdict(int)
+        self._stats = Counter()
         self._stats_lock = asyncio.Lock()
-        
-        if not self.no_db:
-            try:
-                self.connection_pool = mysql.connector.pooling.MySQLConnectionPool(**self.db_config)
-                print("Connection pool created successfully")
-            except Exception as e:
-                print(f"Error creating connection pool: {e}")
-                raise
+
+        # Bounds concurrent batch statements, leaving pool headroom for other queries
+        self._db_sem = asyncio.Semaphore(self.db_config['maxsize'] - 2)
 
     def _db_product_type(self) -> str:
         """Return the actual product_type value in the DB ('wheel' or 'tire') based on self.mode."""
@@ -78,30 +241,114 @@ class DatabaseClient:
     async def init(self, mode: str) -> None:
         self.mode = mode
         print(f"Initializing database for mode: {mode}" + (" (no-db mode)" if self.no_db else ""))
-        print("Database initialized successfully")
 
-    async def _get_connection(self):
-        if self.no_db:
-            print("No-db mode: Skipping database connection")
-            return None
-        
-        max_attempts = 3
-        for attempt in range(max_attempts):
+        # The pool is bound to the running event loop, so it is created here rather than in __init__
+        if not self.no_db and self.connection_pool is None:
             try:
-                loop = asyncio.get_event_loop()
-                connection = await loop.run_in_executor(None, self.connection_pool.get_connection)
-                connection.autocommit = True
-                return connection
-            except mysql.connector.errors.PoolError as e:
-                logger.warning(f"Connection pool error (attempt {attempt+1}/{max_attempts}): {e}")
-                if attempt < max_attempts - 1:
-                    await asyncio.sleep(0.5 * (attempt + 1))  # Shorter retry delay
-                else:
-                    raise
+                self.connection_pool = await aiomysql.create_pool(**self.db_config)
+                print("Connection pool created successfully")
             except Exception as e:
-                logger.error(f"Error getting connection from pool: {e}")
+                print(f"Error creating connection pool: {e}")
                 raise
 
+            try:
+                async with self._acquire() as connection:
+                    async with connection.cursor() as cursor:
+                        await cursor.execute("SELECT VERSION()")
+                        (version,) = await cursor.fetchone()
+                self._values_rows = _supports_values_rows(version)
+            except Exception as e:
+                logger.warning(f"Could not read server version, using CASE batch updates: {e}")
+                self._values_rows = False
+
+        self._q = self._build_queries()
+        print("Database initialized successfully")
+
+    def _build_queries(self) -> Dict:
+        """Build every fixed-shape SQL string once for the current mode.
+
+        List-valued filters are passed as a single JSON parameter, so one query text
+        covers any list length. Only the VALUES-join batch update varies with batch size.
+        """
+        table = self.mode_to_table[self.mode]
+        brands_in = f"SELECT b.brand FROM JSON_TABLE(%s, '$[*]' COLUMNS (brand VARCHAR(255) {_TABLE_COLLATION} PATH '$')) AS b"
+        queries = {
+            'prefetch': f"""
+                SELECT brand, url_part_number, quantity, map_price, sdw_cost
+                FROM {table}
+                WHERE brand IN ({brands_in})
+                  AND url_part_number IS NOT NULL
+                  AND product_type = %s
+                ORDER BY brand
+            """,
+            'url_parts_for_brand': f"""
+                SELECT url_part_number 
+                FROM {table} 
+                WHERE brand = %s 
+                  AND url_part_number IS NOT NULL 
+                  AND product_type = %s
+            """,
+            'url_parts_for_brands': f"""
+                SELECT brand, url_part_number
+                FROM {table}
+                WHERE brand IN ({brands_in})
+                  AND url_part_number IS NOT NULL
+                  AND product_type = %s
+                ORDER BY brand
+            """,
+            'zero_quantity': f"""
+                UPDATE {table}
+                SET quantity = 0,
+                    last_modified = NOW(),
+                    last_sdw_sync = NOW()
+                WHERE url_part_number IN (
+                    SELECT u.url_part_number
+                    FROM JSON_TABLE(%s, '$[*]' COLUMNS (url_part_number VARCHAR(255) {_TABLE_COLLATION} PATH '$')) AS u
+                )
+                AND product_type = %s
+            """,
+            'verify': f"""
+                SELECT url_part_number, product_type, quantity, map_price, sdw_cost, last_modified
+                FROM {table}
+                WHERE url_part_number = %s
+                  AND product_type = %s
+            """,
+            'zero_quantity_brand': f"""
+                UPDATE {table}
+                SET quantity = 0,
+                    last_modified = NOW(),
+                    last_sdw_sync = NOW()
+                WHERE product_type = %s
+                AND brand = %s
+            """,
+        }
+        # One UPDATE per non-empty subset of updatable columns
+        for n in range(1, len(_UPDATABLE_FIELDS) + 1):
+            for columns in combinations(_UPDATABLE_FIELDS, n):
+                queries[('update_fields', columns)] = f"""
+                    UPDATE {table}
+                    SET {', '.join(f'{column} = %s' for column in columns)},
+                        last_modified = NOW(),
+                        last_sdw_sync = NOW()
+                    WHERE url_part_number = %s
+                    AND product_type = %s
+                """
+        return queries
+
+    def _acquire(self):
+        """Acquire a pooled connection (async context manager, released on exit)."""
+        return self.connection_pool.acquire()
+
+    def _stat(self, key: str, n: int = 1) -> None:
+        """Count a statistic into the current call's Counter (or directly into self._stats)."""
+        counter = _stats_ctx.get()
+        (counter if counter is not None else self._stats)[key] += n
+
+    async def _sem_run(self, fn, arg):
+        """Run one batch coroutine under the DB concurrency semaphore."""
+        async with self._db_sem:
+            return await fn(arg)
+
     async def prefetch_url_parts(self, brands: List[str]) -> None:
         """Prefetch and cache URL parts for all brands to avoid repeated DB queries."""
         if self.no_db:
@@ -111,35 +358,38 @@ class DatabaseClient:
         logger.info(f"Prefetching URL parts for {len(brands)} brands...")
         start_time = time.time()
         
-        connection = None
         try:
-            connection = await self._get_connection()
-            cursor = connection.cursor(buffered=True)
-            
-            # Get all URL parts for all brands in a single query
-            placeholders = ', '.join(['%s'] * len(brands))
-            query = f"""
-                SELECT brand, url_part_number
-                FROM {self.mode_to_table[self.mode]}
-                WHERE brand IN ({placeholders})
-                  AND url_part_number IS NOT NULL
-                  AND product_type = %s
-            """
-            
-            params = list(brands) + [self._db_product_type()]
-            cursor.execute(query, params)
-            
-            # Build cache
-            self._url_parts_cache = {brand: set() for brand in brands}
-            row_count = 0
-            
-            for row in cursor:
-                brand, url_part = row
-                if brand in self._url_parts_cache:
-                    self._url_parts_cache[brand].add(url_part)
-                    row_count += 1
+            # Get all URL parts for all brands in a single query.
+            # The brand list travels as one JSON parameter so the query text is
+            # identical regardless of how many brands are requested.
+            query = self._q['prefetch']
+            params = [json.dumps(list(brands)), self._db_product_type()]
+
+            # Build cache while rows stream in from an unbuffered (server-side) cursor,
+            # so the full result set is never held in memory alongside the cache
+            cache = defaultdict(set)
+            row_hashes = {}
+
+            async with self._acquire() as connection:
+                async with connection.cursor(aiomysql.SSCursor) as cursor:
+                    await cursor.execute(query, params)
+                    while True:
+                        rows = await cursor.fetchmany(10000)
+                        if not rows:
+                            break
+                        # Rows arrive sorted by brand, so each brand's slice is consumed by
+                        # C-level map/update calls instead of per-row bytecode
+                        for brand, group in groupby(rows, key=_first):
+                            group = list(group)
+                            url_parts = list(map(_second, group))
+                            cache[brand].update(url_parts)
+                            row_hashes.update(zip(map(_fingerprint, url_parts),
+                                                  starmap(_row_hash, map(_values, group))))
+
+            self._url_parts_cache = {brand: cache.get(brand, set()) for brand in brands}
+            self._row_hash_cache = row_hashes
+            row_count = sum(len(parts) for parts in self._url_parts_cache.values())
             
-            cursor.close()
             self._cache_loaded = True
             
             elapsed = time.time() - start_time
@@ -149,31 +399,36 @@ class DatabaseClient:
             logger.error(f"Error prefetching URL parts: {e}")
             # Initialize empty cache as fallback
             self._url_parts_cache = {brand: set() for brand in brands}
-        finally:
-            if connection:
-                connection.close()
+            self._row_hash_cache = {}
 
-    def get_cached_url_parts(self, brand: str) -> Set[str]:
-        """Get URL parts for a brand from cache."""
-        return self._url_parts_cache.get(brand, set())
+    def get_cached_url_parts(self, brand: str) -> AbstractSet[str]:
+        """Get URL parts for a brand from cache (shared with the cache; must not be mutated)."""
+        return self._url_parts_cache.get(brand, _EMPTY)
 
-    async def batch_update_products_streaming(self, products: List[Dict]) -> Tuple[int, int]:
-        """Optimized batch update for streaming product data. Returns (updated_count, stored_count)."""
+    def contains_url_part(self, url_part: str, brand: str) -> bool:
+        """True if url_part was prefetched for brand, i.e. it already exists in the DB."""
+        return url_part in self._url_parts_cache.get(brand, _EMPTY)
+
+    async def batch_update_products_streaming(self, products: List[Dict], force: bool = False) -> Tuple[int, int]:
+        """Optimized batch update for streaming product data. Returns (updated_count, stored_count).
+
+        Matched products whose quantity/price/cost are identical to the last known DB values
+        are skipped; pass force=True to update them anyway.
+        """
         if self.no_db or not products:
             return 0, 0
         
         # Filter products that exist in our database vs new products
+        contains = self.contains_url_part
         matched_products = []
         unmatched_products = []
         
         for product in products:
             brand = product.get('brand')
             url_part = product.get('url_part_number')
-            if brand and url_part:
-                if url_part in self.get_cached_url_parts(brand):
-                    matched_products.append(product)
-                else:
-                    unmatched_products.append(product)
+            if not brand or not url_part:
+                continue
+            (matched_products if contains(url_part, brand) else unmatched_products).append(product)
         
         if not matched_products and not unmatched_products:
             logger.debug("No products to process")
@@ -189,33 +444,30 @@ class DatabaseClient:
             quantities = []
             prices = []
             costs = []
+            row_hashes = self._row_hash_cache
+            skipped_unchanged = 0
             
             for product in matched_products:
-                url_part = product.get('url_part_number')
-                if not url_part:
-                    continue
-                    
                 try:
-                    # Parse quantity
-                    qty_str = product.get('quantity', '').replace(',', '') if product.get('quantity') else '0'
-                    quantity = int(qty_str) if qty_str.isdigit() else 0
-                    
-                    # Parse price
-                    price_str = product.get('price_map', '')
-                    price = float(price_str) if price_str and price_str.replace('.', '').isdigit() else None
-                    
-                    # Parse cost
-                    cost_str = product.get('cost', '')
-                    cost = float(cost_str) if cost_str and cost_str.replace('.', '').isdigit() else None
-                    
-                    url_parts.append(url_part)
-                    quantities.append(quantity)
-                    prices.append(price)
-                    costs.append(cost)
-                    
-                except (ValueError, TypeError) as e:
-                    logger.debug(f"Error parsing product data for {url_part}: {e}")
+                    parsed = _parse_product(product)
+                except (ValueError, TypeError, AttributeError) as e:
+                    logger.debug(f"Error parsing product data for {product.get('url_part_number')}: {e}")
+                    continue
+                if parsed is None:
+                    continue
+                
+                url_part, quantity, price, cost = parsed
+                if not force and row_hashes.get(_fingerprint(url_part)) == _row_hash(quantity, price, cost):
+                    skipped_unchanged += 1
                     continue
+                
+                url_parts.append(url_part)
+                quantities.append(quantity)
+                prices.append(price)
+                costs.append(cost)
+            
+            if skipped_unchanged:
+                logger.debug(f"Skipped {skipped_unchanged} unchanged products")
             
             if url_parts:
                 matched_updates = await self._optimized_batch_update(url_parts, quantities, prices, costs)
@@ -238,261 +490,232 @@ class DatabaseClient:
         valid_products = []
         for product in products:
             try:
-                # Parse quantity - only store if quantity > 0 (not backordered)
-                qty_str = product.get('quantity', '').replace(',', '') if product.get('quantity') else '0'
-                quantity = int(qty_str) if qty_str.isdigit() else 0
-                
-                # Parse prices
-                price_str = product.get('price_map', '')
-                price = float(price_str) if price_str and price_str.replace('.', '').isdigit() else None
-                
-                cost_str = product.get('cost', '')
-                cost = float(cost_str) if cost_str and cost_str.replace('.', '').isdigit() else None
-                
-                # Only store if quantity > 0 and has at least one price
-                if quantity > 0 and (price is not None or cost is not None):
-                    valid_products.append({
-                        'brand': product.get('brand', ''),
-                        'part_number': product.get('url_part_number', ''),
-                        'url_part_number': product.get('url_part_number', ''),
-                        'quantity': quantity,
-                        'map_price': price,
-                        'sdw_cost': cost,
-                        'url': product.get('url', ''),
-                        'product_type': self._db_product_type()  # ADD THIS LINE
-                    })
-                    
-            except (ValueError, TypeError) as e:
+                parsed = _parse_product(product)
+            except (ValueError, TypeError, AttributeError) as e:
                 logger.debug(f"Error parsing new product data: {e}")
                 continue
+            if parsed is None:
+                continue
+            
+            url_part, quantity, price, cost = parsed
+            
+            # Only store if quantity > 0 (not backordered) and has at least one price
+            if quantity > 0 and (price is not None or cost is not None):
+                valid_products.append({
+                    'brand': product.get('brand', ''),
+                    'part_number': url_part,
+                    'url_part_number': url_part,
+                    'quantity': quantity,
+                    'map_price': price,
+                    'sdw_cost': cost,
+                    'url': product.get('url', ''),
+                    'product_type': self._db_product_type()  # ADD THIS LINE
+                })
         
         if not valid_products:
             logger.debug("No valid new products to store")
             return 0
         
-        # Batch insert/update to not_scraped table
-        batch_size = 100
-        total_stored = 0
-        
-        for i in range(0, len(valid_products), batch_size):
+        if self.db_config['local_infile'] and len(valid_products) > _LOAD_DATA_THRESHOLD:
+            try:
+                return await self._load_new_products(valid_products)
+            except Exception as e:
+                logger.warning(f"LOAD DATA ingest failed, falling back to batched INSERT: {e}")
+        
+        # Batch insert/update to not_scraped table.
+        # executemany rewrites the single-row statement into one multi-row INSERT per batch;
+        # 8 params per row keeps a batch well under MySQL's 65535 placeholder cap.
+        batch_size = min(1000, 65535 // 8)
+        query = """
+            INSERT INTO not_scraped 
+            (brand, part_number, url_part_number, quantity, map_price, sdw_cost, url, product_type)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                quantity = VALUES(quantity),
+                map_price = VALUES(map_price),
+                sdw_cost = VALUES(sdw_cost),
+                url = VALUES(url),
+                product_type = VALUES(product_type)
+        """
+        
+        async def _run_batch(i: int) -> int:
             batch = valid_products[i:i+batch_size]
-            
-            connection = None
+
             try:
-                connection = await self._get_connection()
-                cursor = connection.cursor(buffered=True)
-                
-                # UPDATE THE QUERY TO INCLUDE product_type
-                placeholders = "(%s, %s, %s, %s, %s, %s, %s, %s)"  # Added one more %s
-                values_clause = ", ".join([placeholders] * len(batch))
-                
-                query = f"""
-                    INSERT INTO not_scraped 
-                    (brand, part_number, url_part_number, quantity, map_price, sdw_cost, url, product_type)
-                    VALUES {values_clause}
-                    ON DUPLICATE KEY UPDATE
-                        quantity = VALUES(quantity),
-                        map_price = VALUES(map_price),
-                        sdw_cost = VALUES(sdw_cost),
-                        url = VALUES(url),
-                        product_type = VALUES(product_type)
-                """
-                
-                # Flatten product data for query
-                params = []
-                for product in batch:
-                    params.extend([
-                        product['brand'],
-                        product['part_number'],
-                        product['url_part_number'],
-                        product['quantity'],
-                        product['map_price'],
-                        product['sdw_cost'],
-                        product['url'],
-                        product['product_type']  # ADD THIS LINE
-                    ])
-                
-                cursor.execute(query, params)
-                affected = cursor.rowcount
-                total_stored += affected
-                connection.commit()
-                cursor.close()
+                rows = [
+                    (p['brand'], p['part_number'], p['url_part_number'], p['quantity'],
+                     p['map_price'], p['sdw_cost'], p['url'], p['product_type'])
+                    for p in batch
+                ]
                 
+                async with self._acquire() as connection:
+                    async with connection.cursor() as cursor:
+                        await cursor.executemany(query, rows)
+                        affected = cursor.rowcount
+
                 logger.debug(f"Stored/updated {affected} new products (batch {i//batch_size + 1})")
-                
+                return affected
+
             except Exception as e:
                 logger.error(f"Error storing new products batch: {e}")
-            finally:
-                if connection:
-                    connection.close()
-        
-        return total_stored
+                return 0
+
+        # Batches touch disjoint rows, so they can run concurrently
+        results = await asyncio.gather(*(self._sem_run(_run_batch, i)
+                                         for i in range(0, len(valid_products), batch_size)))
+        return sum(results)
 
-    async def _optimized_batch_update(self, url_parts: List[str], quantities: List[int], 
+    async def _load_new_products(self, valid_products: List[Dict]) -> int:
+        """Upsert a large set of new products via LOAD DATA LOCAL INFILE into a staging table.
+
+        The server parses the file directly instead of binding 8 placeholders per row.
+        """
+        columns = ', '.join(_NOT_SCRAPED_COLUMNS)
+        rows = (tuple(p[column] for column in _NOT_SCRAPED_COLUMNS) for p in valid_products)
+        with _load_data_file(rows) as path:
+            # The temporary table is per-session, so every step must run on one connection
+            async with self._acquire() as connection:
+                async with connection.cursor() as cursor:
+                    await cursor.execute("CREATE TEMPORARY TABLE tmp_ns LIKE not_scraped")
+                    try:
+                        await cursor.execute(f"""
+                            LOAD DATA LOCAL INFILE %s INTO TABLE tmp_ns
+                            CHARACTER SET utf8mb4
+                            FIELDS TERMINATED BY '\\t'
+                            LINES TERMINATED BY '\\n'
+                            ({columns})
+                        """, (path,))
+                        await cursor.execute(f"""
+                            INSERT INTO not_scraped ({columns})
+                            SELECT {columns} FROM tmp_ns
+                            ON DUPLICATE KEY UPDATE
+                                quantity = VALUES(quantity),
+                                map_price = VALUES(map_price),
+                                sdw_cost = VALUES(sdw_cost),
+                                url = VALUES(url),
+                                product_type = VALUES(product_type)
+                        """)
+                        affected = cursor.rowcount
+                    finally:
+                        # Pooled sessions are not reset on release, so drop it explicitly
+                        await cursor.execute("DROP TEMPORARY TABLE IF EXISTS tmp_ns")
+        
+        logger.debug(f"Stored/updated {affected} new products via LOAD DATA ({len(valid_products)} rows)")
+        return affected
+
+    async def _optimized_batch_update(self, url_parts: List[str], quantities: List[Optional[int]], 
                                     prices: List[Optional[float]], costs: List[Optional[float]]) -> int:
-        """Highly optimized batch update with single transaction."""
+        """Highly optimized batch update with single transaction.
+
+        A None quantity/price/cost leaves that column unchanged.
+        """
         if not url_parts:
             return 0
         
         product_type = self._db_product_type()
         batch_size = 300  # Optimized batch size
-        total_updates = 0
         
-        for i in range(0, len(url_parts), batch_size):
+        # Sort by url_part_number so each batch probes a contiguous range of the index
+        # instead of scattering random lookups across it
+        order = sorted(range(len(url_parts)), key=url_parts.__getitem__)
+        url_parts = [url_parts[i] for i in order]
+        quantities = [quantities[i] for i in order]
+        prices = [prices[i] for i in order]
+        costs = [costs[i] for i in order]
+        
+        async def _run_batch(i: int) -> int:
             batch_urls = url_parts[i:i+batch_size]
             batch_quantities = quantities[i:i+batch_size]
             batch_prices = prices[i:i+batch_size]
             batch_costs = costs[i:i+batch_size]
             
-            connection = None
             try:
-                connection = await self._get_connection()
-                cursor = connection.cursor(buffered=True)
-                
-                # Build comprehensive update query with CASE statements
-                updates = []
-                params = []
-                
-                # Quantity updates (always present)
-                qty_cases = []
-                for url, qty in zip(batch_urls, batch_quantities):
-                    qty_cases.append("WHEN %s THEN %s")
-                    params.extend([url, qty])
-                updates.append(f"quantity = CASE url_part_number {' '.join(qty_cases)} ELSE quantity END")
-                
-                # Price updates (only for non-null values) 
-                price_urls = [url for url, price in zip(batch_urls, batch_prices) if price is not None]
-                if price_urls:
-                    price_cases = []
-                    for url, price in zip(batch_urls, batch_prices):
-                        if price is not None:
-                            price_cases.append("WHEN %s THEN %s")
-                            params.extend([url, price])
-                    updates.append(f"map_price = CASE url_part_number {' '.join(price_cases)} ELSE map_price END")
-                
-                # Cost updates (only for non-null values)
-                cost_urls = [url for url, cost in zip(batch_urls, batch_costs) if cost is not None]
-                if cost_urls:
-                    cost_cases = []
-                    for url, cost in zip(batch_urls, batch_costs):
-                        if cost is not None:
-                            cost_cases.append("WHEN %s THEN %s")
-                            params.extend([url, cost])
-                    updates.append(f"sdw_cost = CASE url_part_number {' '.join(cost_cases)} ELSE sdw_cost END")
-                
-                # Timestamps
-                updates.extend([
-                    "last_modified = NOW()",
-                    "last_sdw_sync = NOW()"
-                ])
-                
-                # Build final query
-                query = f"""
-                    UPDATE {self.mode_to_table[self.mode]}
-                    SET {', '.join(updates)}
-                    WHERE url_part_number IN ({', '.join(['%s'] * len(batch_urls))})
-                    AND product_type = %s
-                """
-                
-                params.extend(batch_urls)
-                params.append(product_type)
+                # VALUES ROW() needs MySQL 8.0.19+; older servers get the equivalent CASE UPDATE
+                build = _values_update if self._values_rows else _case_update
+                query, params = build(self.mode_to_table[self.mode], batch_urls, batch_quantities,
+                                      batch_prices, batch_costs, product_type)
+                if query is None:
+                    return 0
                 
-                cursor.execute(query, params)
-                batch_updates = cursor.rowcount
-                total_updates += batch_updates
+                async with self._acquire() as connection:
+                    async with connection.cursor() as cursor:
+                        await cursor.execute(query, params)
+                        batch_updates = cursor.rowcount
                 
-                connection.commit()
-                cursor.close()
+                # Remember what the DB now holds so the next sync can skip unchanged rows
+                for url, qty, price, cost in zip(batch_urls, batch_quantities, batch_prices, batch_costs):
+                    self._row_hash_cache[_fingerprint(url)] = _row_hash(qty, price, cost)
                 
-                async with self._stats_lock:
-                    self._stats['batch_updates'] += 1
-                    self._stats['products_updated'] += batch_updates
+                self._stat('batch_updates')
+                self._stat('products_updated', batch_updates)
                 
                 logger.debug(f"Batch updated {batch_updates} products (batch {i//batch_size + 1})")
+                return batch_updates
                 
             except Exception as e:
                 logger.error(f"Error in optimized batch update: {e}")
-                if connection:
-                    try:
-                        connection.rollback()
-                    except:
-                        pass
-            finally:
-                if connection:
-                    connection.close()
+                return 0
         
-        return total_updates
+        # Batches touch disjoint rows, so they can run concurrently
+        # Batches count into a local Counter that is merged into self._stats once
+        token = _stats_ctx.set(Counter())
+        try:
+            results = await asyncio.gather(*(self._sem_run(_run_batch, i)
+                                             for i in range(0, len(url_parts), batch_size)))
+        finally:
+            self._stats.update(_stats_ctx.get())
+            _stats_ctx.reset(token)
+        return sum(results)
 
-    async def get_all_url_part_numbers(self, brand: str) -> Set[str]:
-        """Get URL parts for a single brand (fallback for non-cached access)."""
+    async def get_all_url_part_numbers(self, brand: str) -> AbstractSet[str]:
+        """Get URL parts for a single brand (fallback for non-cached access).
+
+        When served from cache the returned set is shared with the cache and must not be mutated.
+        """
         if self.no_db:
             return set()
         
         # Use cache if available
         if self._cache_loaded and brand in self._url_parts_cache:
-            return self._url_parts_cache[brand].copy()
+            return self._url_parts_cache[brand]
         
         # Fallback to database query
-        connection = None
         try:
-            connection = await self._get_connection()
-            cursor = connection.cursor(buffered=True)
-            query = f"""
-                SELECT url_part_number 
-                FROM {self.mode_to_table[self.mode]} 
-                WHERE brand = %s 
-                  AND url_part_number IS NOT NULL 
-                  AND product_type = %s
-            """
-            cursor.execute(query, (brand, self._db_product_type()))
-            rows = cursor.fetchall()
-            url_parts = set(row[0] for row in rows)
-            cursor.close()
-            return url_parts
+            async with self._acquire() as connection:
+                async with connection.cursor() as cursor:
+                    await cursor.execute(self._q['url_parts_for_brand'], (brand, self._db_product_type()))
+                    rows = await cursor.fetchall()
+            return set(map(_first, rows))
         except Exception as e:
             logger.error(f"Error in get_all_url_part_numbers: {e}")
             return set()
-        finally:
-            if connection:
-                connection.close()
 
-    async def get_all_url_parts_for_brands(self, brands: List[str]) -> Dict[str, Set[str]]:
-        """Get all URL part numbers for multiple brands."""
+    async def get_all_url_parts_for_brands(self, brands: List[str]) -> Dict[str, AbstractSet[str]]:
+        """Get all URL part numbers for multiple brands.
+
+        When served from cache the returned sets are shared with the cache and must not be mutated.
+        """
         if self.no_db or not brands:
             return {brand: set() for brand in brands}
         
         # Use cache if available
-        if self._cache_loaded:
-            return {brand: self._url_parts_cache.get(brand, set()).copy() for brand in brands}
+        if self._cache_loaded and all(brand in self._url_parts_cache for brand in brands):
+            return {brand: self._url_parts_cache[brand] for brand in brands}
         
         # Fallback to database query
-        connection = None
         try:
-            connection = await self._get_connection()
-            cursor = connection.cursor(buffered=True)
-            placeholders = ', '.join(['%s'] * len(brands))
-            query = f"""
-                SELECT brand, url_part_number
-                FROM {self.mode_to_table[self.mode]}
-                WHERE brand IN ({placeholders})
-                  AND url_part_number IS NOT NULL
-                  AND product_type = %s
-            """
-            cursor.execute(query, brands + [self._db_product_type()])
-            rows = cursor.fetchall()
+            async with self._acquire() as connection:
+                async with connection.cursor() as cursor:
+                    await cursor.execute(self._q['url_parts_for_brands'], (json.dumps(list(brands)), self._db_product_type()))
+                    rows = await cursor.fetchall()
             result = {brand: set() for brand in brands}
-            for row in rows:
-                brand, url_part = row
+            for brand, group in groupby(rows, key=_first):
                 if brand in result:
-                    result[brand].add(url_part)
-            cursor.close()
+                    result[brand].update(map(_second, group))
             return result
         except Exception as e:
             logger.error(f"Error getting URL parts for multiple brands: {e}")
             return {brand: set() for brand in brands}
-        finally:
-            if connection:
-                connection.close()
 
     async def batch_update_products(self, url_parts: List[str], quantities: List[int], 
                                   prices: List[Optional[float]], costs: List[Optional[float]]) -> int:
@@ -505,41 +728,30 @@ class DatabaseClient:
             return 0
         
         product_type = self._db_product_type()
+        query = self._q['zero_quantity']
         batch_size = 500
-        total_affected = 0
         
-        for i in range(0, len(url_parts), batch_size):
+        async def _run_batch(i: int) -> int:
             batch = url_parts[i:i+batch_size]
             
-            connection = None
             try:
-                connection = await self._get_connection()
-                cursor = connection.cursor(buffered=True)
-                placeholders = ', '.join(['%s'] * len(batch))
-                query = f"""
-                    UPDATE {self.mode_to_table[self.mode]}
-                    SET quantity = 0,
-                        last_modified = NOW(),
-                        last_sdw_sync = NOW()
-                    WHERE url_part_number IN ({placeholders})
-                    AND product_type = %s
-                """
-                params = batch + [product_type]
-                cursor.execute(query, params)
-                affected = cursor.rowcount
-                total_affected += affected
-                connection.commit()
-                cursor.close()
+                params = (json.dumps(batch), product_type)
+                async with self._acquire() as connection:
+                    async with connection.cursor() as cursor:
+                        await cursor.execute(query, params)
+                        affected = cursor.rowcount
                 
                 logger.debug(f"Set {affected} products to quantity 0 (batch {i//batch_size + 1})")
+                return affected
 
             except Exception as e:
                 logger.error(f"Error in batch_set_zero_quantity: {e}")
-            finally:
-                if connection:
-                    connection.close()
+                return 0
 
-        return total_affected
+        # Batches touch disjoint rows, so they can run concurrently
+        results = await asyncio.gather(*(self._sem_run(_run_batch, i)
+                                         for i in range(0, len(url_parts), batch_size)))
+        return sum(results)
 
     async def get_statistics(self) -> Dict:
         """Get processing statistics."""
@@ -552,141 +764,80 @@ class DatabaseClient:
         if self.no_db:
             return {"exists": False}
         
-        connection = None
         try:
-            connection = await self._get_connection()
-            cursor = connection.cursor(dictionary=True, buffered=True)
-            query = f"""
-                SELECT url_part_number, product_type, quantity, map_price, sdw_cost, last_modified
-                FROM {self.mode_to_table[self.mode]}
-                WHERE url_part_number = %s
-                  AND product_type = %s
-            """
-            cursor.execute(query, (url_part, product_type))
-            result = cursor.fetchone()
-            cursor.close()
+            async with self._acquire() as connection:
+                async with connection.cursor(aiomysql.DictCursor) as cursor:
+                    await cursor.execute(self._q['verify'], (url_part, product_type))
+                    result = await cursor.fetchone()
             return result or {"exists": False}
         except Exception as e:
             logger.error(f"Error in verify_updates: {e}")
             return {"error": str(e)}
-        finally:
-            if connection:
-                connection.close()
 
-    async def update_map_price_by_url(self, url_part: str, price: float, product_type: str) -> None:
-        """Update MAP price for one product by url_part_number."""
+    async def update_fields_by_url(self, url_part: str, product_type: str, *,
+                                   quantity=_UNSET, map_price=_UNSET, sdw_cost=_UNSET) -> int:
+        """Update any of quantity/map_price/sdw_cost for one product in a single UPDATE.
+
+        Only the fields that are passed are written. Returns the number of affected rows.
+        """
         if self.no_db:
-            return
+            return 0
+        
+        columns = []
+        params = []
+        for column, value in zip(_UPDATABLE_FIELDS, (quantity, map_price, sdw_cost)):
+            if value is not _UNSET:
+                columns.append(column)
+                params.append(value)
+        if not columns:
+            return 0
+        params.extend([url_part, product_type])
         
-        connection = None
+        async with self._acquire() as connection:
+            async with connection.cursor() as cursor:
+                await cursor.execute(self._q[('update_fields', tuple(columns))], params)
+                return cursor.rowcount
+
+    async def update_map_price_by_url(self, url_part: str, price: float, product_type: str) -> None:
+        """Update MAP price for one product by url_part_number."""
         try:
-            connection = await self._get_connection()
-            cursor = connection.cursor(buffered=True)
-            query = f"""
-                UPDATE {self.mode_to_table[self.mode]}
-                SET map_price = %s, 
-                    last_modified = NOW(),
-                    last_sdw_sync = NOW()
-                WHERE url_part_number = %s
-                AND product_type = %s
-            """
-            cursor.execute(query, (price, url_part, product_type))
-            rows_affected = cursor.rowcount
-            connection.commit()
-            cursor.close()
+            rows_affected = await self.update_fields_by_url(url_part, product_type, map_price=price)
             logger.debug(f"Updated map_price for {url_part} to {price}, affected {rows_affected} rows")
         except Exception as e:
             logger.error(f"Error in update_map_price_by_url: {e}")
             raise e
-        finally:
-            if connection:
-                connection.close()
 
     async def update_cost_by_url(self, url_part: str, cost: float, product_type: str) -> None:
         """Update cost for one product by url_part_number."""
-        if self.no_db:
-            return
-        
-        connection = None
         try:
-            connection = await self._get_connection()
-            cursor = connection.cursor(buffered=True)
-            query = f"""
-                UPDATE {self.mode_to_table[self.mode]}
-                SET sdw_cost = %s, 
-                    last_modified = NOW(),
-                    last_sdw_sync = NOW()
-                WHERE url_part_number = %s
-                AND product_type = %s
-            """
-            cursor.execute(query, (cost, url_part, product_type))
-            rows_affected = cursor.rowcount
-            connection.commit()
-            cursor.close()
+            rows_affected = await self.update_fields_by_url(url_part, product_type, sdw_cost=cost)
             logger.debug(f"Updated cost for {url_part} to {cost}, affected {rows_affected} rows")
         except Exception as e:
             logger.error(f"Error in update_cost_by_url: {e}")
             raise e
-        finally:
-            if connection:
-                connection.close()
 
     async def update_quantity_by_url(self, url_part: str, quantity: int, product_type: str) -> None:
         """Update quantity for one product by url_part_number."""
-        if self.no_db:
-            return
-        
-        connection = None
         try:
-            connection = await self._get_connection()
-            cursor = connection.cursor(buffered=True)
-            query = f"""
-                UPDATE {self.mode_to_table[self.mode]}
-                SET quantity = %s, 
-                    last_modified = NOW(),
-                    last_sdw_sync = NOW()
-                WHERE url_part_number = %s
-                AND product_type = %s
-            """
-            cursor.execute(query, (quantity, url_part, product_type))
-            rows_affected = cursor.rowcount
-            connection.commit()
-            cursor.close()
+            await self.update_fields_by_url(url_part, product_type, quantity=quantity)
             logger.debug(f"Updated quantity for {url_part} to {quantity}")
         except Exception as e:
             logger.error(f"Error in update_quantity_by_url: {e}")
-        finally:
-            if connection:
-                connection.close()
 
     async def bulk_update_quantity_zero(self, product_type: str, brand: str) -> None:
         """Set quantity=0 for all products of a given brand and product_type."""
         if self.no_db:
             return
         
-        connection = None
         try:
-            connection = await self._get_connection()
-            cursor = connection.cursor(buffered=True)
-            query = f"""
-                UPDATE {self.mode_to_table[self.mode]}
-                SET quantity = 0, 
-                    last_modified = NOW(),
-                    last_sdw_sync = NOW()
-                WHERE product_type = %s
-                AND brand = %s
-            """
-            cursor.execute(query, (product_type, brand))
-            rows_affected = cursor.rowcount
-            connection.commit()
-            cursor.close()
+            async with self._acquire() as connection:
+                async with connection.cursor() as cursor:
+                    await cursor.execute(self._q['zero_quantity_brand'], (product_type, brand))
+                    rows_affected = cursor.rowcount
             logger.info(f"Bulk updated quantity=0 for brand {brand}, product_type={product_type}, rows={rows_affected}")
         except Exception as e:
             logger.error(f"Error in bulk_update_quantity_zero: {e}")
             raise e
-        finally:
-            if connection:
-                connection.close()
 
     async def close(self) -> None:
         if self.no_db:
@@ -700,12 +851,14 @@ class DatabaseClient:
             logger.info(f"Final DB statistics: {dict(stats)}")
         
         try:
-            if hasattr(self.connection_pool, 'close'):
+            if self.connection_pool is not None:
                 self.connection_pool.close()
+                await self.connection_pool.wait_closed()
+                self.connection_pool = None
                 logger.info("Connection pool closed")
         except Exception as e:
             logger.error(f"Error closing connection pool: {e}")
 
 print("Creating optimized database client instance...")
 db_client = DatabaseClient()
-print("Database client instance created")
\ No newline at end of file
+print("Database client instance created")